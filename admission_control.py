@@ -0,0 +1,147 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+logger = logging.getLogger("app_logger")
+
+
+class AdmissionRejected(Exception):
+    """Очередь заполнена или ожидание слишком долгое - запрос отклоняется сразу"""
+
+    def __init__(self, model: str, reason: str, status_code: int = 429, retry_after: Optional[float] = None):
+        super().__init__(f"{model}: {reason}")
+        self.model = model
+        self.reason = reason
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class ModelLimiter:
+    """Лимит одновременных вызовов одной модели с ограниченной очередью ожидания"""
+
+    def __init__(self, model: str, max_concurrent: int, max_queue: int, max_wait: float):
+        self.model = model
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.active = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.total_wait = 0.0
+        self.max_observed_wait = 0.0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._recent_waits: Deque[float] = deque(maxlen=1000)
+
+    async def acquire(self):
+        if self.active < self.max_concurrent and not self._waiters:
+            self.active += 1
+            self._record_wait(0.0)
+            return
+
+        if len(self._waiters) >= self.max_queue:
+            self.rejected += 1
+            raise AdmissionRejected(self.model, "queue is full", status_code=429, retry_after=self._retry_after())
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(waiter, timeout=self.max_wait)
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            raise AdmissionRejected(self.model, "queue wait timeout", status_code=503, retry_after=self._retry_after())
+        except asyncio.CancelledError:
+            # Слот мог быть уже передан этому ожидающему - возвращаем его следующему
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+
+        self._record_wait(time.monotonic() - started)
+
+    def release(self):
+        # Слот передаётся первому живому ожидающему без уменьшения active
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        waits = sorted(self._recent_waits)
+        return {
+            "active": self.active,
+            "queued": len(self._waiters),
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "avg_wait_seconds": round(self.total_wait / self.admitted, 4) if self.admitted else 0.0,
+            "p95_wait_seconds": round(waits[int(len(waits) * 0.95) - 1], 4) if waits else 0.0,
+            "max_wait_seconds": round(self.max_observed_wait, 4)
+        }
+
+    def _record_wait(self, waited: float):
+        self.admitted += 1
+        self.total_wait += waited
+        self.max_observed_wait = max(self.max_observed_wait, waited)
+        self._recent_waits.append(waited)
+
+    def _retry_after(self) -> float:
+        average = self.total_wait / self.admitted if self.admitted else 1.0
+        return max(1.0, round(average * (len(self._waiters) + 1) / max(self.max_concurrent, 1), 1))
+
+
+class AdmissionController:
+    """Контроль допуска к LLM: общий лимит и отдельные лимиты для каждой модели"""
+
+    def __init__(self, model_limits: Dict[str, int], global_limit: int, max_queue: int, max_wait: float,
+                 default_limit: int = 8):
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.default_limit = default_limit
+        self.global_limiter = ModelLimiter("global", global_limit, max_queue, max_wait)
+        self.limiters: Dict[str, ModelLimiter] = {
+            model: ModelLimiter(model, limit, max_queue, max_wait)
+            for model, limit in model_limits.items()
+        }
+
+    def limiter(self, model: str) -> ModelLimiter:
+        if model not in self.limiters:
+            self.limiters[model] = ModelLimiter(model, self.default_limit, self.max_queue, self.max_wait)
+        return self.limiters[model]
+
+    def slot(self, model: str) -> "_Slot":
+        return _Slot(self.limiter(model), self.global_limiter)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "global": self.global_limiter.stats(),
+            "models": {model: limiter.stats() for model, limiter in self.limiters.items()}
+        }
+
+
+class _Slot:
+    def __init__(self, model_limiter: ModelLimiter, global_limiter: ModelLimiter):
+        self.model_limiter = model_limiter
+        self.global_limiter = global_limiter
+
+    async def __aenter__(self):
+        await self.model_limiter.acquire()
+        try:
+            await self.global_limiter.acquire()
+        except BaseException:
+            self.model_limiter.release()
+            raise
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.global_limiter.release()
+        self.model_limiter.release()
@@ -1,6 +1,9 @@
+import difflib
 import logging
 import re
-from typing import List
+import unicodedata
+from functools import lru_cache
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple, Union
 from enum import Enum
 
 class SubjectDetailLevel(str, Enum):
@@ -13,6 +16,116 @@ logging.basicConfig(level=logging.INFO)
 
 FORBIDDEN_ENVS = ['align', 'equation', 'array', 'matrix', 'multline', 'gather', 'flalign']
 
+# Каждый маркер xStart:/xEnd: кончается на ':', а тег начинается с '<' - в прозе оба символа редки,
+# поэтому кандидаты ищутся через str.find (C-цикл), а не регуляркой по каждой позиции текста.
+# Префикс (note, translate, ...) сверяется со срезом текста перед маркером уже при поиске
+BLOCK_KINDS = ("start", "end")
+BLOCK_TAGS = ("<chat>", "</chat>", "<literature>", "</literature>", "<words>", "</words>")
+BLOCK_LABEL_PATTERN = re.compile(r"([A-Za-z]*)(start|end):?", re.IGNORECASE)
+
+
+class BlockMap:
+    """Карта блоков ответа модели: текст нормализуется и сканируется один раз, парсеры только ищут в карте"""
+
+    def __init__(self, response: str):
+        text = self.text = response.replace('\r\n', '\n').strip()
+        # "start"/"end"/"<chat>"/"</chat>"... -> [(начало, конец, маркер как в тексте, есть ли пробелы перед ':')]
+        self.markers: Dict[str, List[Tuple[int, int, str, bool]]] = {}
+
+        colon = text.find(":")
+        while colon != -1:
+            kind_end = colon
+            while kind_end > 0 and text[kind_end - 1].isspace():
+                kind_end -= 1
+            for kind in BLOCK_KINDS:
+                kind_start = kind_end - len(kind)
+                raw = text[kind_start:kind_end]
+                if kind_start >= 0 and raw.lower() == kind:
+                    self.markers.setdefault(kind, []).append((kind_start, colon + 1, raw, kind_end != colon))
+                    break
+            colon = text.find(":", colon + 1)
+
+        bracket = text.find("<")
+        while bracket != -1:
+            for tag in BLOCK_TAGS:
+                raw = text[bracket:bracket + len(tag)]
+                if raw.lower() == tag:
+                    self.markers.setdefault(tag, []).append((bracket, bracket + len(tag), raw, False))
+                    break
+            bracket = text.find("<", bracket + 1)
+
+    def find(self, label: str, after: int = 0, exact: bool = False) -> Optional[Tuple[int, int]]:
+        """Первое вхождение метки ("noteStart", "End:", "<chat>") с позиции after.
+
+        По умолчанию - как re.search(r'labelStart\s*:', re.IGNORECASE); exact=True - как str.find("labelStart:")."""
+        if label.startswith("<"):
+            for start, end, raw, _ in self.markers.get(label.lower(), ()):
+                if start >= after and (not exact or raw == label):
+                    return start, end
+            return None
+
+        parsed = BLOCK_LABEL_PATTERN.fullmatch(label)
+        if parsed is None:
+            index = self.text.find(label, after)
+            return (index, index + len(label)) if index != -1 else None
+
+        prefix, kind = parsed.group(1), parsed.group(2)
+        for kind_start, end, raw_kind, has_gap in self.markers.get(kind.lower(), ()):
+            start = kind_start - len(prefix)
+            if start < after:
+                continue
+            found_prefix = self.text[start:kind_start]
+            if exact:
+                if raw_kind == kind and not has_gap and found_prefix == prefix:
+                    return start, end
+            elif found_prefix.lower() == prefix.lower():
+                return start, end
+        return None
+
+
+@lru_cache(maxsize=64)
+def _cached_block_map(response: str) -> BlockMap:
+    return BlockMap(response)
+
+
+def get_block_map(response: Union[str, BlockMap]) -> BlockMap:
+    """Один и тот же ответ разбирают несколько парсеров подряд - карта строится для него один раз"""
+    if isinstance(response, BlockMap):
+        return response
+    return _cached_block_map(response)
+
+
+def extract_block(
+    response: Union[str, BlockMap],
+    block_start: str,
+    block_end: str,
+    errors: list,
+    exact: bool = False,
+    check_order: bool = True
+) -> Optional[str]:
+    """Содержимое между block_start и block_end или None (ошибка уже добавлена в errors).
+
+    exact=True повторяет старый разбор через str.find: метки с учётом регистра, конец ищется после начала."""
+    blocks = get_block_map(response)
+    start_label = block_start if block_start.startswith("<") or block_start.endswith(":") else f"{block_start}:"
+    end_label = block_end if block_end.startswith("<") or block_end.endswith(":") else f"{block_end}:"
+
+    start = blocks.find(block_start, exact=exact)
+    if start is None:
+        errors.append(f"Błąd parsowania: brak etykiety {start_label}")
+        return None
+
+    end = blocks.find(block_end, after=start[0] if exact else 0, exact=exact)
+    if end is None:
+        errors.append(f"Błąd parsowania: brak etykiety {end_label}")
+        return None
+    if check_order and end[0] <= (start[0] if exact else start[1]):
+        errors.append(f"Błąd parsowania: etykieta {end_label} znajduje się przed {start_label}")
+        return None
+
+    return blocks.text[start[1]: end[0]].strip()
+
+
 def remove_duplicates(subtopics: List[str]) -> List[str]:
     seen = set()
     unique = []
@@ -23,31 +136,87 @@ def remove_duplicates(subtopics: List[str]) -> List[str]:
             unique.append(normalized)
     return unique
 
+# Один токенизатор на всё: разделители формул, экранированный \$ и \begin{...}/\end{...}
+LATEX_TOKEN_PATTERN = re.compile(
+    r"\\\$|\$\$|\$|\\\[|\\\]|\\\(|\\\)|\\(?P<command>begin|end)\{(?P<env>[^{}]*)\}"
+)
+MATH_CLOSERS = {"$$": "$$", "$": "$", "\\[": "\\]", "\\(": "\\)"}
+FORBIDDEN_ENV_SET = frozenset(FORBIDDEN_ENVS)
+
+
+class LatexViolation(NamedTuple):
+    offset: int
+    env: str
+    command: str
+    in_math: bool
+    formula: Optional[Tuple[int, int]]
+
+
+def find_latex_violations(text: str) -> List[LatexViolation]:
+    """Все запрещённые окружения в тексте за один проход, с позициями и признаком "внутри формулы".
+
+    Формула - от открывающего разделителя до ближайшего парного закрывающего; незакрытый
+    разделитель формулу не открывает, найденные после него окружения считаются вне формулы."""
+    violations: List[LatexViolation] = []
+    opener = None
+    opened_at = 0
+    pending: List[Tuple[int, str, str]] = []
+
+    for match in LATEX_TOKEN_PATTERN.finditer(text):
+        env = match.group("env")
+        if env is not None:
+            if env in FORBIDDEN_ENV_SET:
+                found = (match.start(), env, match.group("command"))
+                if opener is None:
+                    violations.append(LatexViolation(*found, False, None))
+                else:
+                    pending.append(found)
+            continue
+
+        token = match.group(0)
+        if token == "\\$":
+            continue
+
+        if opener is not None:
+            # "$$" сразу после "$...": первый знак закрывает формулу, второй открывает новую
+            closes = token == MATH_CLOSERS[opener] or (opener == "$" and token == "$$")
+            if not closes:
+                continue
+            close_end = match.start() + len(MATH_CLOSERS[opener])
+            violations.extend(LatexViolation(*found, True, (opened_at, close_end)) for found in pending)
+            pending = []
+            opener = None
+            if token == "$$" and close_end == match.start() + 1:
+                opener, opened_at = "$", close_end
+            continue
+
+        if token in MATH_CLOSERS:
+            opener, opened_at = token, match.start()
+
+    violations.extend(LatexViolation(*found, False, None) for found in pending)
+    return violations
+
+
 def validate_latex(line: str, errors: list) -> bool:
-    patterns = [
-        r'\$\$(.*?)\$\$',
-        r'\\\[(.*?)\\\]',
-        r'\\\((.*?)\\\)',
-        r'\$(.*?)\$'
-    ]
-
-    for pat in patterns:
-        for match in re.finditer(pat, line, re.DOTALL):
-            formula_content = match.group(1)
-            for env in FORBIDDEN_ENVS:
-                if re.search(r'\\begin\{' + env + r'\}', formula_content) or \
-                   re.search(r'\\end\{' + env + r'\}', formula_content):
-                    errors.append(f"Niedozwolone środowisko LaTeX '{env}' w formule: {match.group(0)}")
-                    return False
-
-    temp_line = re.sub(r'\$\$.*?\$\$|\\\[.*?\\\]|\\\(.*?\\\)|\$.*?\$', '', line, flags=re.DOTALL)
-    for env in FORBIDDEN_ENVS:
-        if re.search(r'\\begin\{' + env + r'\}', temp_line) or \
-           re.search(r'\\end\{' + env + r'\}', temp_line):
-            errors.append(f"Niedozwolone środowisko LaTeX '{env}' poza formułą w linii: {line}")
-            return False
-
-    return True
+    violations = find_latex_violations(line)
+
+    for violation in violations:
+        if violation.in_math:
+            start, end = violation.formula
+            errors.append(
+                f"Niedozwolone środowisko LaTeX '{violation.env}' w formule "
+                f"(pozycja {violation.offset}): {line[start:end]}"
+            )
+        else:
+            snippet = line[max(0, violation.offset - 40): violation.offset + 60]
+            errors.append(
+                f"Niedozwolone środowisko LaTeX '{violation.env}' poza formułą "
+                f"(pozycja {violation.offset}) w linii: {snippet}"
+            )
+
+    return not violations
+
+SEMICOLON_SPACING_PATTERN = re.compile(r"\s;\s|\s;|;\s")
 
 def remove_empty_lines(lines: list[str]) -> list[str]:
     return [line for line in lines if line.strip()]
@@ -72,6 +241,193 @@ def extract_wrong_words(words: list) -> list:
             wrong_words.append(item.strip())
     return wrong_words
 
+def parse_subtopic_line(line: str, errors: list, percent_message: str = "Ocena ważności") -> Tuple[Optional[list], bool]:
+    """Строка "название;оценка" -> ([название, оценка], False) или (None, считать ли отказ ошибкой формата)"""
+    if SEMICOLON_SPACING_PATTERN.search(line):
+        errors.append(f"Błąd formatu podtematu (spacje wokół ';' są niedozwolone): '{line}'")
+        return None, True
+    semicolon_idx = find_last_semicolon_outside_braces(line)
+    if semicolon_idx == -1:
+        errors.append(f"Błąd formatu podtematu (brak znaku ';'): '{line}'")
+        return None, False
+
+    name = line[:semicolon_idx]
+    score_str = line[semicolon_idx + 1:]
+
+    if name != name.strip():
+        errors.append(f"Nazwa podtematu zawiera białe znaki na początku lub końcu: '{name}'")
+        return None, True
+    if not validate_latex(name, errors):
+        errors.append(f"Błąd LaTeX w podtemacie: '{line}'")
+        return None, True
+
+    score_str = score_str.replace('%', '').replace(',', '.').strip()
+
+    try:
+        if score_str == "":
+            errors.append(f"{percent_message} jest pusta w podtemacie '{line}'")
+            return None, True
+
+        score = int(round(float(score_str)))
+    except ValueError:
+        errors.append(f"{percent_message} nie jest liczbą całkowitą: '{score_str}' w podtemacie '{line}'")
+        return None, True
+
+    return [name, score], False
+
+def parse_subtopic_status_line(line: str, errors: list) -> Tuple[Optional[list], bool]:
+    """Строка "название;статус" -> ([название, статус], False) или (None, считать ли отказ ошибкой формата)"""
+    if SEMICOLON_SPACING_PATTERN.search(line):
+        errors.append(f"Błąd formatu podtematu (spacje wokół ';' są niedozwolone): '{line}'")
+        return None, True
+    semicolon_idx = find_last_semicolon_outside_braces(line)
+    if semicolon_idx == -1:
+        errors.append(f"Błąd formatu podtematu (brak znaku ';'): '{line}'")
+        return None, False
+
+    name = line[:semicolon_idx]
+    status = line[semicolon_idx + 1:]
+
+    if name != name.strip():
+        errors.append(f"Nazwa podtematu zawiera białe znaki na początku lub końcu: '{name}'")
+        return None, True
+    if not validate_latex(name, errors):
+        errors.append(f"Błąd LaTeX w podtemacie: '{line}'")
+        return None, True
+    if status not in SubjectDetailLevel.__members__:
+        errors.append(f"Nieprawidłowy status: {status}")
+        return None, True
+    if status == "":
+        errors.append(f"Status jest pusty w podtemacie '{line}'")
+        return None, True
+
+    return [name, status], False
+
+def parse_word_line(line: str, errors: list, percent_message: str = "Częstotliwość słowa tematycznego") -> Tuple[Optional[list], bool]:
+    """Строка "слово;частота" -> ([слово, частота], False) или (None, считать ли отказ ошибкой формата)"""
+    if SEMICOLON_SPACING_PATTERN.search(line):
+        errors.append(f"Błąd formatu słowa tematycznego (spacje wokół ';' są niedozwolone): '{line}'")
+        return None, True
+    semicolon_idx = find_last_semicolon_outside_braces(line)
+    if semicolon_idx == -1:
+        errors.append(f"Błąd formatu słowa tematycznego (brak znaku ';'): '{line}'")
+        return None, False
+
+    name = line[:semicolon_idx]
+    score_str = line[semicolon_idx + 1:]
+
+    if "%" in score_str:
+        errors.append(f"{percent_message} nie może zawierać '%': '{score_str}' w słowie tematycznym '{line}'")
+        return None, True
+
+    try:
+        if score_str == "":
+            errors.append(f"{percent_message} jest pusta w słowie tematycznym '{line}'")
+            return None, True
+
+        score = int(score_str)
+    except ValueError:
+        errors.append(f"{percent_message} nie jest liczbą całkowitą: '{score_str}' w słowie tematycznym '{line}'")
+        return None, True
+
+    return [name, score], False
+
+def _block_marker_pattern(label: str, exact: bool) -> re.Pattern:
+    if exact:
+        return re.compile(re.escape(label))
+    parsed = BLOCK_LABEL_PATTERN.fullmatch(label)
+    return re.compile(rf"{re.escape(parsed.group(1))}{parsed.group(2)}\s*:", re.IGNORECASE)
+
+
+class StreamValidator:
+    """Инкрементальная проверка ответа по мере стриминга.
+
+    Завершённые строки внутри блока проверяются теми же правилами, что и в парсере эндпоинта;
+    первая строка, которую парсер всё равно отклонит, возвращается как список ошибок - попытку
+    можно оборвать, не дожидаясь конца генерации. Незавершённая последняя строка не проверяется."""
+
+    BEFORE, INSIDE, AFTER = range(3)
+
+    def __init__(
+        self,
+        block_start: str = "Start:",
+        block_end: str = "End:",
+        exact: bool = False,
+        line_parser: Optional[Callable[[str, list], Tuple[Optional[list], bool]]] = None,
+        check_latex: bool = False,
+        duplicate_message: Optional[str] = None,
+        start_within: Optional[int] = None
+    ):
+        self.start_label = block_start if block_start.endswith(":") else f"{block_start}:"
+        self._start = _block_marker_pattern(block_start, exact)
+        self._end = _block_marker_pattern(block_end, exact)
+        self.line_parser = line_parser
+        self.check_latex = check_latex
+        self.duplicate_message = duplicate_message
+        self.start_within = start_within
+
+        self.state = self.BEFORE
+        self.lines_checked = 0
+        self._buffer = ""
+        self._consumed = 0
+        self._seen = set()
+
+    def feed(self, text: str) -> List[str]:
+        """Добавляет фрагмент ответа; возвращает ошибки первой отклонённой строки или пустой список"""
+        if self.state == self.AFTER:
+            return []
+
+        self._buffer += text
+        newline = self._buffer.rfind("\n")
+        if newline == -1:
+            return []
+
+        completed, self._buffer = self._buffer[:newline], self._buffer[newline + 1:]
+        self._consumed += newline + 1
+
+        for line in completed.split("\n"):
+            errors = self._check_line(line.rstrip("\r"))
+            if errors:
+                return errors
+            if self.state == self.AFTER:
+                self._buffer = ""
+                return []
+
+        if self.state == self.BEFORE and self.start_within is not None and self._consumed > self.start_within:
+            return [f"Błąd parsowania: brak etykiety {self.start_label}"]
+        return []
+
+    def _check_line(self, line: str) -> List[str]:
+        if self.state == self.BEFORE:
+            match = self._start.search(line)
+            if match is None:
+                return []
+            self.state = self.INSIDE
+            line = line[match.end():]
+
+        match = self._end.search(line)
+        if match is not None:
+            line = line[:match.start()]
+            self.state = self.AFTER
+
+        line = line.strip()
+        if not line:
+            return []
+
+        self.lines_checked += 1
+        if self.duplicate_message is not None:
+            if line in self._seen:
+                return [self.duplicate_message]
+            self._seen.add(line)
+
+        errors = []
+        if self.line_parser is not None:
+            self.line_parser(line, errors)
+        if self.check_latex:
+            validate_latex(line, errors)
+        return errors
+
+
 def parse_subtopics_response(
     old_subtopics: list,
     response: str,
@@ -81,19 +437,9 @@ def parse_subtopics_response(
     blockEnd: str = "End:"
 ) -> list:
     try:
-        start_idx = response.find(f"{blockStart}")
-        end_idx = response.find(f"{blockEnd}", start_idx)
-        if start_idx == -1:
-            errors.append(f"Błąd parsowania: brak etykiety {blockStart}")
-            return old_subtopics
-        if end_idx == -1:
-            errors.append(f"Błąd parsowania: brak etykiety {blockEnd}")
+        content = extract_block(response, f"{blockStart}", f"{blockEnd}", errors, exact=True)
+        if content is None:
             return old_subtopics
-        if end_idx <= start_idx:
-            errors.append(f"Błąd parsowania: etykieta {blockEnd} znajduje się przed {blockStart}")
-            return old_subtopics
-
-        content = response[start_idx + len(blockStart): end_idx].strip()
         if not content:
             errors.append(f"Błąd parsowania: brak podtematów pomiędzy {blockStart} a {blockEnd}")
             return old_subtopics
@@ -108,42 +454,12 @@ def parse_subtopics_response(
         has_error = False
 
         for line in unique_lines:
-            if re.search(r"\s;\s|\s;|;\s", line):
-                errors.append(f"Błąd formatu podtematu (spacje wokół ';' są niedozwolone): '{line}'")
-                has_error = True
-                continue
-            semicolon_idx = find_last_semicolon_outside_braces(line)
-            if semicolon_idx == -1:
-                errors.append(f"Błąd formatu podtematu (brak znaku ';'): '{line}'")
-                continue
-
-            name = line[:semicolon_idx]
-            score_str = line[semicolon_idx + 1:]
-
-            if name != name.strip():
-                errors.append(f"Nazwa podtematu zawiera białe znaki na początku lub końcu: '{name}'")
-                has_error = True
-                continue
-            if not validate_latex(name, errors):
-                errors.append(f"Błąd LaTeX w podtemacie: '{line}'")
-                has_error = True
-                continue
-
-            score_str = score_str.replace('%', '').replace(',', '.').strip()
-
-            try:
-                if score_str == "":
-                    errors.append(f"{percent_message} jest pusta w podtemacie '{line}'")
-                    has_error = True
-                    continue
-
-                score = int(round(float(score_str)))
-            except ValueError:
-                errors.append(f"{percent_message} nie jest liczbą całkowitą: '{score_str}' w podtemacie '{line}'")
-                has_error = True
+            subtopic, line_error = parse_subtopic_line(line, errors, percent_message)
+            if subtopic is None:
+                has_error = has_error or line_error
                 continue
 
-            final_subtopics.append([name, score])
+            final_subtopics.append(subtopic)
 
         if has_error and not final_subtopics:
             errors.append("Wszystkie podtematy zostały odrzucone ze względu na błędy formatowania.")
@@ -157,19 +473,9 @@ def parse_subtopics_response(
 
 def parse_subtopics_status_response(old_subtopics: list, response: str, errors: list) -> list:
     try:
-        start_idx = response.find("Start:")
-        end_idx = response.find("End:", start_idx)
-        if start_idx == -1:
-            errors.append("Błąd parsowania: brak etykiety Start:")
-            return old_subtopics
-        if end_idx == -1:
-            errors.append("Błąd parsowania: brak etykiety End:")
-            return old_subtopics
-        if end_idx <= start_idx:
-            errors.append("Błąd parsowania: etykieta End: znajduje się przed Start:")
+        content = extract_block(response, "Start:", "End:", errors, exact=True)
+        if content is None:
             return old_subtopics
-
-        content = response[start_idx + len("Start:"): end_idx].strip()
         if not content:
             errors.append("Błąd parsowania: brak podtematów pomiędzy Start: a End:")
             return old_subtopics
@@ -184,36 +490,12 @@ def parse_subtopics_status_response(old_subtopics: list, response: str, errors:
         has_error = False
 
         for line in unique_lines:
-            if re.search(r"\s;\s|\s;|;\s", line):
-                errors.append(f"Błąd formatu podtematu (spacje wokół ';' są niedozwolone): '{line}'")
-                has_error = True
-                continue
-            semicolon_idx = find_last_semicolon_outside_braces(line)
-            if semicolon_idx == -1:
-                errors.append(f"Błąd formatu podtematu (brak znaku ';'): '{line}'")
-                continue
-
-            name = line[:semicolon_idx]
-            status = line[semicolon_idx + 1:]
-
-            if name != name.strip():
-                errors.append(f"Nazwa podtematu zawiera białe znaki na początku lub końcu: '{name}'")
-                has_error = True
-                continue
-            if not validate_latex(name, errors):
-                errors.append(f"Błąd LaTeX w podtemacie: '{line}'")
-                has_error = True
-                continue
-            if status not in SubjectDetailLevel.__members__:
-                errors.append(f"Nieprawidłowy status: {status}")
-                has_error = True
-                continue
-            if status == "":
-                errors.append(f"Status jest pusty w podtemacie '{line}'")
-                has_error = True
+            subtopic, line_error = parse_subtopic_status_line(line, errors)
+            if subtopic is None:
+                has_error = has_error or line_error
                 continue
 
-            final_subtopics.append([name, status])
+            final_subtopics.append(subtopic)
 
         if has_error and not final_subtopics:
             errors.append("Wszystkie podtematy zostały odrzucone ze względu na błędy formatowania.")
@@ -227,19 +509,9 @@ def parse_subtopics_status_response(old_subtopics: list, response: str, errors:
 
 def parse_words_response(old_words: list, response: str, errors: list, percent_message: str="Częstotliwość słowa tematycznego") -> list:
     try:
-        start_idx = response.find("Start:")
-        end_idx = response.find("End:", start_idx)
-        if start_idx == -1:
-            errors.append("Błąd parsowania: brak etykiety Start:")
+        content = extract_block(response, "Start:", "End:", errors, exact=True)
+        if content is None:
             return old_words
-        if end_idx == -1:
-            errors.append("Błąd parsowania: brak etykiety End:")
-            return old_words
-        if end_idx <= start_idx:
-            errors.append("Błąd parsowania: etykieta End: znajduje się przed Start:")
-            return old_words
-
-        content = response[start_idx + len("Start:"): end_idx].strip()
         if not content:
             errors.append("Błąd parsowania: brak słów tematycznych pomiędzy Start: a End:")
             return old_words
@@ -254,36 +526,12 @@ def parse_words_response(old_words: list, response: str, errors: list, percent_m
         has_error = False
 
         for line in unique_lines:
-            if re.search(r"\s;\s|\s;|;\s", line):
-                errors.append(f"Błąd formatu słowa tematycznego (spacje wokół ';' są niedozwolone): '{line}'")
-                has_error = True
+            word, line_error = parse_word_line(line, errors, percent_message)
+            if word is None:
+                has_error = has_error or line_error
                 continue
-            semicolon_idx = find_last_semicolon_outside_braces(line)
-            if semicolon_idx == -1:
-                errors.append(f"Błąd formatu słowa tematycznego (brak znaku ';'): '{line}'")
-                continue
-
-            name = line[:semicolon_idx]
-            score_str = line[semicolon_idx + 1:]
 
-            if "%" in score_str:
-                errors.append(f"{percent_message} nie może zawierać '%': '{score_str}' w słowie tematycznym '{line}'")
-                has_error = True
-                continue
-
-            try:
-                if score_str == "":
-                    errors.append(f"{percent_message} jest pusta w słowie tematycznym '{line}'")
-                    has_error = True
-                    continue
-
-                score = int(score_str)
-            except ValueError:
-                errors.append(f"{percent_message} nie jest liczbą całkowitą: '{score_str}' w słowie tematycznym '{line}'")
-                has_error = True
-                continue
-
-            final_words.append([name, score])
+            final_words.append(word)
 
         if has_error and not final_words:
             errors.append("Wszystkie słowy tematyczne zostały odrzucone ze względu na błędy formatowania.")
@@ -297,22 +545,9 @@ def parse_words_response(old_words: list, response: str, errors: list, percent_m
 
 def parse_task_response(old_text: str, response: str, errors: list) -> str:
     try:
-        response = response.replace('\r\n', '\n').strip()
-
-        start_match = re.search(r'Start\s*:', response, re.IGNORECASE)
-        end_match = re.search(r'End\s*:', response, re.IGNORECASE)
-
-        if not start_match:
-            errors.append("Błąd parsowania: brak etykiety Start:")
+        final_text = extract_block(response, "Start", "End", errors)
+        if final_text is None:
             return old_text
-        if not end_match:
-            errors.append("Błąd parsowania: brak etykiety End:")
-            return old_text
-        if end_match.start() <= start_match.end():
-            errors.append("Błąd parsowania: etykieta End: znajduje się przed Start:")
-            return old_text
-
-        final_text = response[start_match.end(): end_match.start()].strip()
 
         if not final_text:
             errors.append("Błąd: tekst zadania jest pusty")
@@ -329,22 +564,9 @@ def parse_task_response(old_text: str, response: str, errors: list) -> str:
 
 def parse_translate_response(old_translate: str, response: str, errors: list) -> str:
     try:
-        response = response.replace('\r\n', '\n').strip()
-
-        start_match = re.search(r'Start\s*:', response, re.IGNORECASE)
-        end_match = re.search(r'End\s*:', response, re.IGNORECASE)
-
-        if not start_match:
-            errors.append("Błąd parsowania: brak etykiety Start:")
-            return old_translate
-        if not end_match:
-            errors.append("Błąd parsowania: brak etykiety End:")
+        final_translate = extract_block(response, "Start", "End", errors)
+        if final_translate is None:
             return old_translate
-        if end_match.start() <= start_match.end():
-            errors.append("Błąd parsowania: etykieta End: znajduje się przed Start:")
-            return old_translate
-
-        final_translate = response[start_match.end(): end_match.start()].strip()
 
         if not final_translate:
             errors.append("Błąd: tekst zadania jest pusty")
@@ -357,22 +579,9 @@ def parse_translate_response(old_translate: str, response: str, errors: list) ->
 
 def parse_chat_response(old_chat: str, response: str, errors: list) -> str:
     try:
-        response = response.replace('\r\n', '\n').strip()
-
-        start_match = re.search(r'<chat>', response, re.IGNORECASE)
-        end_match = re.search(r'</chat>', response, re.IGNORECASE)
-
-        if not start_match:
-            errors.append("Błąd parsowania: brak etykiety <chat>")
-            return old_chat
-        if not end_match:
-            errors.append("Błąd parsowania: brak etykiety </chat>")
+        final_chat = extract_block(response, "<chat>", "</chat>", errors)
+        if final_chat is None:
             return old_chat
-        if end_match.start() <= start_match.end():
-            errors.append("Błąd parsowania: etykieta </chat> znajduje się przed <chat>")
-            return old_chat
-
-        final_chat = response[start_match.end(): end_match.start()].strip()
 
         if not final_chat:
             errors.append("Błąd: tekst czatu jest pusty")
@@ -385,23 +594,10 @@ def parse_chat_response(old_chat: str, response: str, errors: list) -> str:
 
 def parse_literature_response(old_note: str, response: str, errors: list) -> str:
     try:
-        response = response.replace('\r\n', '\n').strip()
-
-        start_match = re.search(r'<literature>', response, re.IGNORECASE)
-        end_match = re.search(r'</literature>', response, re.IGNORECASE)
-
-        if not start_match:
-            errors.append("Błąd parsowania: brak etykiety <literature>")
-            return old_note
-        if not end_match:
-            errors.append("Błąd parsowania: brak etykiety </literature>")
-            return old_note
-        if end_match.start() <= start_match.end():
-            errors.append("Błąd parsowania: etykieta </literature> znajduje się przed <literature>")
+        final_chat = extract_block(response, "<literature>", "</literature>", errors)
+        if final_chat is None:
             return old_note
 
-        final_chat = response[start_match.end(): end_match.start()].strip()
-
         if not final_chat:
             errors.append("Błąd: tekst literatury jest pusty")
             return old_note
@@ -413,23 +609,10 @@ def parse_literature_response(old_note: str, response: str, errors: list) -> str
 
 def parse_note_response(old_note: str, response: str, errors: list) -> str:
     try:
-        response = response.replace('\r\n', '\n').strip()
-
-        start_match = re.search(r'noteStart\s*:', response, re.IGNORECASE)
-        end_match = re.search(r'noteEnd\s*:', response, re.IGNORECASE)
-
-        if not start_match:
-            errors.append("Błąd parsowania: brak etykiety noteStart:")
-            return old_note
-        if not end_match:
-            errors.append("Błąd parsowania: brak etykiety noteEnd:")
-            return old_note
-        if end_match.start() <= start_match.end():
-            errors.append("Błąd parsowania: etykieta noteEnd: znajduje się przed noteStart:")
+        final_text = extract_block(response, "noteStart", "noteEnd", errors)
+        if final_text is None:
             return old_note
 
-        final_text = response[start_match.end(): end_match.start()].strip()
-
         if not final_text:
             errors.append("Błąd: notatka zadania jest pusta")
             return old_note
@@ -442,11 +625,12 @@ def parse_note_response(old_note: str, response: str, errors: list) -> str:
         errors.append(f"Błąd nieoczekiwany podczas parsowania: {str(e)}")
         return old_note
 
-def ensure_start_end_markers(response: str) -> str:
-    response = response.replace('\r\n', '\n').strip()
+def ensure_start_end_markers(response: Union[str, BlockMap]) -> str:
+    blocks = get_block_map(response)
+    response = blocks.text
 
-    has_start = re.search(r'Start\s*:', response, re.IGNORECASE)
-    has_end = re.search(r'End\s*:', response, re.IGNORECASE)
+    has_start = blocks.find("Start")
+    has_end = blocks.find("End")
 
     has_krok1 = re.search(r'^\*\*Krok 1:\*\*', response, re.MULTILINE | re.IGNORECASE)
     has_answer = re.search(r'\*\*Odpowiedź:\*\*', response, re.IGNORECASE)
@@ -458,7 +642,7 @@ def ensure_start_end_markers(response: str) -> str:
             return f"Start:\n**Odpowiedź:**\n{response}\nEnd:"
 
     if not has_start and has_end:
-        end_pos = has_end.start()
+        end_pos = has_end[0]
         before_end = response[:end_pos].strip()
         markers_part = response[end_pos:]
 
@@ -468,7 +652,7 @@ def ensure_start_end_markers(response: str) -> str:
             return f"Start:\n{markers_part}"
 
     if has_start and not has_end:
-        start_pos = has_start.end()
+        start_pos = has_start[1]
         after_start = response[start_pos:].strip()
         before_start = response[:start_pos]
 
@@ -477,31 +661,15 @@ def ensure_start_end_markers(response: str) -> str:
 
 def parse_solution_response(old_solution: str, response: str, errors: list) -> str:
     try:
-        response = response.replace('\r\n', '\n').strip()
-        has_start = re.search(r'Start\s*:', response, re.IGNORECASE)
-        has_end = re.search(r'End\s*:', response, re.IGNORECASE)
+        blocks = get_block_map(response)
 
-        if not has_start or not has_end:
+        if blocks.find("Start") is None or blocks.find("End") is None:
             errors.append("UWAGA: Brak znaczników Start:/End:, dodaję automatycznie")
-            response = ensure_start_end_markers(response)
-
-            start_match = re.search(r'Start\s*:', response, re.IGNORECASE)
-            end_match = re.search(r'End\s*:', response, re.IGNORECASE)
-        else:
-            start_match = has_start
-            end_match = has_end
+            blocks = get_block_map(ensure_start_end_markers(blocks))
 
-        if not start_match:
-            errors.append("Błąd parsowania: brak etykiety Start:")
+        final_text = extract_block(blocks, "Start", "End", errors)
+        if final_text is None:
             return old_solution
-        if not end_match:
-            errors.append("Błąd parsowania: brak etykiety End:")
-            return old_solution
-        if end_match.start() <= start_match.end():
-            errors.append("Błąd parsowania: etykieta End: znajduje się przed Start:")
-            return old_solution
-
-        final_text = response[start_match.end(): end_match.start()].strip()
 
         if not final_text:
             errors.append("Błąd: rozwiązanie zadania jest puste")
@@ -517,22 +685,9 @@ def parse_solution_response(old_solution: str, response: str, errors: list) -> s
 
 def parse_frequency_response(old_frequency: int, response: str, errors: list) -> int:
     try:
-        response = response.replace('\r\n', '\n').strip()
-
-        start_match = re.search(r'frequencyStart\s*:', response, re.IGNORECASE)
-        end_match = re.search(r'frequencyEnd\s*:', response, re.IGNORECASE)
-
-        if not start_match:
-            errors.append("Błąd parsowania: brak etykiety frequencyStart:")
-            return old_frequency
-        if not end_match:
-            errors.append("Błąd parsowania: brak etykiety frequencyEnd:")
+        freq_text = extract_block(response, "frequencyStart", "frequencyEnd", errors)
+        if freq_text is None:
             return old_frequency
-        if end_match.start() <= start_match.end():
-            errors.append("Błąd parsowania: etykieta frequencyEnd: znajduje się przed frequencyStart:")
-            return old_frequency
-
-        freq_text = response[start_match.end(): end_match.start()].strip()
 
         if not freq_text:
             errors.append("Błąd: blok częstotliwości jest pusty")
@@ -556,22 +711,9 @@ def parse_explanation_response(old_explanation: str, response: str, errors: list
                                output_subtopics: list, correctOption: str, userOption: str,
                                topic: str, type: str) -> str:
     try:
-        response = response.replace('\r\n', '\n').strip()
-
-        start_match = re.search(r'explanationStart\s*:', response, re.IGNORECASE)
-        end_match = re.search(r'explanationEnd\s*:', response, re.IGNORECASE)
-
-        if not start_match:
-            errors.append("Błąd parsowania: brak etykiety explanationStart:")
-            return old_explanation
-        if not end_match:
-            errors.append("Błąd parsowania: brak etykiety explanationEnd:")
-            return old_explanation
-        if end_match.start() <= start_match.end():
-            errors.append("Błąd parsowania: etykieta explanationEnd znajduje się przed explanationStart:")
+        final_text = extract_block(response, "explanationStart", "explanationEnd", errors)
+        if final_text is None:
             return old_explanation
-
-        final_text = response[start_match.end(): end_match.start()].strip()
         if not final_text:
             return old_explanation
 
@@ -629,23 +771,10 @@ def parse_explanation_response(old_explanation: str, response: str, errors: list
 
 def parse_writing_explanation(old_explanation: str, response: str, errors: list) -> str:
     try:
-        response = response.replace('\r\n', '\n').strip()
-
-        start_match = re.search(r'explanationStart\s*:', response, re.IGNORECASE)
-        end_match = re.search(r'explanationEnd\s*:', response, re.IGNORECASE)
-
-        if not start_match:
-            errors.append("Błąd parsowania: brak etykiety explanationStart:")
-            return old_explanation
-        if not end_match:
-            errors.append("Błąd parsowania: brak etykiety explanationEnd:")
-            return old_explanation
-        if end_match.start() <= start_match.end():
-            errors.append("Błąd parsowania: etykieta explanationEnd znajduje się przed explanationStart:")
+        final_text = extract_block(response, "explanationStart", "explanationEnd", errors)
+        if final_text is None:
             return old_explanation
 
-        final_text = response[start_match.end(): end_match.start()].strip()
-
         if not final_text:
             return old_explanation
 
@@ -657,22 +786,9 @@ def parse_writing_explanation(old_explanation: str, response: str, errors: list)
 
 def parse_words_output_text_response(old_text: str, response: str, errors: list) -> str:
     try:
-        response = response.replace('\r\n', '\n').strip()
-
-        start_match = re.search(r'Start\s*:', response, re.IGNORECASE)
-        end_match = re.search(r'End\s*:', response, re.IGNORECASE)
-
-        if not start_match:
-            errors.append("Błąd parsowania: brak etykiety Start:")
+        final_text = extract_block(response, "Start", "End", errors)
+        if final_text is None:
             return old_text
-        if not end_match:
-            errors.append("Błąd parsowania: brak etykiety End:")
-            return old_text
-        if end_match.start() <= start_match.end():
-            errors.append("Błąd parsowania: etykieta End: znajduje się przed Start:")
-            return old_text
-
-        final_text = response[start_match.end(): end_match.start()].strip()
 
         if not final_text:
             errors.append("Błąd: tekst pojaśnienia jest pusty")
@@ -686,22 +802,9 @@ def parse_words_output_text_response(old_text: str, response: str, errors: list)
 
 def parse_interactive_task_text_response(old_text: str, response: str, errors: list) -> str:
     try:
-        response = response.replace('\r\n', '\n').strip()
-
-        start_match = re.search(r'Start\s*:', response, re.IGNORECASE)
-        end_match = re.search(r'End\s*:', response, re.IGNORECASE)
-
-        if not start_match:
-            errors.append("Błąd parsowania: brak etykiety Start:")
-            return old_text
-        if not end_match:
-            errors.append("Błąd parsowania: brak etykiety End:")
+        final_text = extract_block(response, "Start", "End", errors)
+        if final_text is None:
             return old_text
-        if end_match.start() <= start_match.end():
-            errors.append("Błąd parsowania: etykieta End: znajduje się przed Start:")
-            return old_text
-
-        final_text = response[start_match.end(): end_match.start()].strip()
 
         if not final_text:
             errors.append("Błąd: tekst opowiadania jest pusty")
@@ -715,22 +818,9 @@ def parse_interactive_task_text_response(old_text: str, response: str, errors: l
 
 def parse_interactive_task_translate_response(old_translate: str, response: str, errors: list) -> str:
     try:
-        response = response.replace('\r\n', '\n').strip()
-
-        start_match = re.search(r'translateStart\s*:', response, re.IGNORECASE)
-        end_match = re.search(r'translateEnd\s*:', response, re.IGNORECASE)
-
-        if not start_match:
-            errors.append("Błąd parsowania: brak etykiety translateStart:")
-            return old_translate
-        if not end_match:
-            errors.append("Błąd parsowania: brak etykiety translateEnd:")
+        final_translate = extract_block(response, "translateStart", "translateEnd", errors)
+        if final_translate is None:
             return old_translate
-        if end_match.start() <= start_match.end():
-            errors.append("Błąd parsowania: etykieta translateEnd: znajduje się przed translateStart:")
-            return old_translate
-
-        final_translate = response[start_match.end(): end_match.start()].strip()
 
         if not final_translate:
             errors.append("Błąd: tekst tłumaczenia opowiadania jest pusty")
@@ -747,19 +837,9 @@ def parse_options_response(old_data: dict, response: str, errors: list) -> dict:
     }
 
     try:
-        start_idx = response.find("Start:")
-        end_idx = response.find("End:", start_idx)
-        if start_idx == -1:
-            errors.append("Błąd parsowania: brak etykiety Start:")
-            return final_data
-        if end_idx == -1:
-            errors.append("Błąd parsowania: brak etykiety End:")
+        content = extract_block(response, "Start:", "End:", errors, exact=True)
+        if content is None:
             return final_data
-        if end_idx <= start_idx:
-            errors.append("Błąd parsowania: etykieta End: znajduje się przed Start:")
-            return final_data
-
-        content = response[start_idx + len("Start:"): end_idx].strip()
         if not content:
             errors.append("Błąd parsowania: brak wariantów oraz numeru lub index prawidłowej odpowiedzi pomiędzy Start: a End:")
             return final_data
@@ -792,32 +872,109 @@ def parse_options_response(old_data: dict, response: str, errors: list) -> dict:
         errors.append(f"Błąd nieoczekiwany podczas parsowania: {str(e)}")
         return final_data
 
-def parse_output_subtopics_response_filtered(old_subtopics: list, new_subtopics: list, subtopics: list, errors: list) -> list:
+# Подсказки считаются только для первых промахов: каждая - линейный проход difflib по индексу
+MAX_SUGGESTED_MISSES = 20
+
+
+def normalize_name(name: str) -> str:
+    """Ключ сравнения названий: без крайних пробелов, casefold, NFC"""
+    return unicodedata.normalize("NFC", unicodedata.normalize("NFD", name.strip()).casefold())
+
+
+class NameIndex:
+    """Хэш-индекс названий (словарь, список подтем) по нормализованному ключу.
+
+    Проверка принадлежности - один поиск в dict вместо прохода по всему списку; для промахов
+    difflib подбирает ближайшие названия среди начинающихся с той же буквы."""
+
+    def __init__(self, names: Iterable[str]):
+        self.names: Dict[str, str] = {}
+        for name in names:
+            self.names.setdefault(normalize_name(name), name)
+        self._by_initial: Optional[Dict[str, List[str]]] = None
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __contains__(self, name: str) -> bool:
+        return normalize_name(name) in self.names
+
+    def get(self, name: str) -> Optional[str]:
+        """Название в написании из списка или None"""
+        return self.names.get(normalize_name(name))
+
+    def suggest(self, name: str, n: int = 3, cutoff: float = 0.8) -> List[str]:
+        key = normalize_name(name)
+        if not key:
+            return []
+        if self._by_initial is None:
+            by_initial: Dict[str, List[str]] = {}
+            for candidate in self.names:
+                by_initial.setdefault(candidate[:1], []).append(candidate)
+            self._by_initial = by_initial
+
+        matches = difflib.get_close_matches(key, self._by_initial.get(key[0], ()), n=n, cutoff=cutoff)
+        return [self.names[match] for match in matches]
+
+
+@lru_cache(maxsize=32)
+def _cached_name_index(names: Tuple[str, ...]) -> NameIndex:
+    return NameIndex(names)
+
+
+def get_name_index(names: Union[Iterable[str], NameIndex]) -> NameIndex:
+    """Индекс строится один раз на список: раунды converge и повторные парсеры берут его из кэша"""
+    if isinstance(names, NameIndex):
+        return names
+    return _cached_name_index(tuple(names))
+
+
+def format_suggestions(suggestions: List[str]) -> str:
+    if not suggestions:
+        return ""
+    return " Czy chodziło o: " + ", ".join(f"'{suggestion}'" for suggestion in suggestions) + "?"
+
+
+def report_missing_subtopic(name: str, index: NameIndex, misses: int, errors: list):
+    suggestions = index.suggest(name) if misses < MAX_SUGGESTED_MISSES else []
+    errors.append(f"Podtemat '{name}' nie znajduje się w liście subtopics.{format_suggestions(suggestions)}")
+
+
+def parse_output_subtopics_response_filtered(
+    old_subtopics: list,
+    new_subtopics: list,
+    subtopics: Union[list, NameIndex],
+    errors: list
+) -> list:
+    index = get_name_index(subtopics)
     filtered_subtopics = []
+    seen = set()
+    misses = 0
 
     for name, score in new_subtopics:
-        if name not in subtopics:
-            errors.append(f"Podtemat '{name}' nie znajduje się w liście subtopics.")
-        else:
-            filtered_subtopics.append([name, score])
+        canonical = index.get(name)
+        if canonical is None:
+            report_missing_subtopic(name, index, misses, errors)
+            misses += 1
+        elif canonical not in seen:
+            seen.add(canonical)
+            filtered_subtopics.append([canonical, score])
 
     if not filtered_subtopics:
         return old_subtopics
 
     return filtered_subtopics
 
-def parse_output_subtopics_response(old_subtopics: list, subtopics: list, response: str, errors: list) -> list:
+def parse_output_subtopics_response(
+    old_subtopics: list,
+    subtopics: Union[list, NameIndex],
+    response: str,
+    errors: list
+) -> list:
     try:
-        start_idx = response.find("subtopicsStart:")
-        end_idx = response.find("subtopicsEnd:", start_idx)
-        if start_idx == -1:
-            errors.append("Błąd parsowania: brak etykiety subtopicsStart:")
+        content = extract_block(response, "subtopicsStart:", "subtopicsEnd:", errors, exact=True, check_order=False)
+        if content is None:
             return old_subtopics
-        if end_idx == -1:
-            errors.append("Błąd parsowania: brak etykiety subtopicsEnd:")
-            return old_subtopics
-
-        content = response[start_idx + len("subtopicsStart:"): end_idx].strip()
         if not content:
             errors.append("Błąd parsowania: brak podtematów pomiędzy subtopicsStart: a subtopicsEnd:")
             return old_subtopics
@@ -843,18 +1000,25 @@ def parse_output_subtopics_response(old_subtopics: list, subtopics: list, respon
                 seen.add(name)
                 unique_names.append(name)
 
-        subtopics_names = [s[0] if isinstance(s, (list, tuple)) else s.split(";")[0].strip() for s in subtopics]
+        if not isinstance(subtopics, NameIndex):
+            subtopics = [s[0] if isinstance(s, (list, tuple)) else s.split(";")[0].strip() for s in subtopics]
+        index = get_name_index(subtopics)
         final_subtopics = []
+        seen = set()
+        misses = 0
 
         for name in unique_names:
             if not validate_latex(name, errors):
                 errors.append(f"Błąd LaTeX w podtemacie: '{name}'")
                 continue
 
-            if name in subtopics_names:
-                final_subtopics.append(name)
-            else:
-                errors.append(f"Podtemat '{name}' nie znajduje się w liście subtopics.")
+            canonical = index.get(name)
+            if canonical is None:
+                report_missing_subtopic(name, index, misses, errors)
+                misses += 1
+            elif canonical not in seen:
+                seen.add(canonical)
+                final_subtopics.append(canonical)
 
         return final_subtopics if final_subtopics else old_subtopics
 
@@ -864,17 +1028,9 @@ def parse_output_subtopics_response(old_subtopics: list, subtopics: list, respon
 
 def parse_output_exam_topics_response(old_topics: list, response: str, errors: list) -> list:
     try:
-        start_idx = response.find("Start:")
-        end_idx = response.find("End:", start_idx)
-
-        if start_idx == -1:
-            errors.append("Błąd parsowania: brak etykiety Start:")
-            return old_topics
-        if end_idx == -1:
-            errors.append("Błąd parsowania: brak etykiety End:")
+        content = extract_block(response, "Start:", "End:", errors, exact=True, check_order=False)
+        if content is None:
             return old_topics
-
-        content = response[start_idx + len("Start:"): end_idx].strip()
         if not content:
             errors.append("Błąd parsowania: brak tematów pomiędzy Start: a End:")
             return old_topics
@@ -909,25 +1065,15 @@ def parse_output_exam_topics_response(old_topics: list, response: str, errors: l
 
 def parse_output_words_response(
     old_words: list,
-    words: list,
+    words: Union[list, NameIndex],
     response: str,
     errors: list,
     words_are_tuples: bool = True
 ) -> list:
     try:
-        start_idx = response.find("<words>")
-        end_idx = response.find("</words>", start_idx)
-        if start_idx == -1:
-            errors.append("Błąd parsowania: brak etykiety <words>")
-            return old_words
-        if end_idx == -1:
-            errors.append("Błąd parsowania: brak etykiety </words>")
+        content = extract_block(response, "<words>", "</words>", errors, exact=True)
+        if content is None:
             return old_words
-        if end_idx <= start_idx:
-            errors.append("Błąd parsowania: etykieta </words> znajduje się przed <words>")
-            return old_words
-
-        content = response[start_idx + len("<words>"): end_idx].strip()
         if not content:
             errors.append("Błąd parsowania: brak wyrazów pomiędzy <words> a </words>")
             return old_words
@@ -937,16 +1083,25 @@ def parse_output_words_response(
         lines = remove_empty_lines(lines)
         unique_lines = list(dict.fromkeys(lines))
 
+        if words_are_tuples and not isinstance(words, NameIndex):
+            words = [w[0] for w in words]
+        index = get_name_index(words)
+
         filtered_words = []
+        missing = []
 
         for name in unique_lines:
-            name_lower = name.lower()
-            if words_are_tuples:
-                if any(name_lower == w[0].lower() for w in words):
-                    filtered_words.append(name)
+            if name in index:
+                filtered_words.append(name)
             else:
-                if any(name_lower == w.lower() for w in words):
-                    filtered_words.append(name)
+                missing.append(name)
+
+        if missing and logger.isEnabledFor(logging.INFO):
+            # Слова вне словаря по-прежнему молча отбрасываются; подсказки - только в лог
+            hints = [
+                f"'{name}'{format_suggestions(index.suggest(name))}" for name in missing[:MAX_SUGGESTED_MISSES]
+            ]
+            logger.info(f"Pominięto {len(missing)} wyrazów spoza listy: {'; '.join(hints)}")
 
         if not filtered_words:
             return old_words
@@ -957,32 +1112,37 @@ def parse_output_words_response(
         errors.append(f"Błąd nieoczekiwany podczas parsowania wyrazów: {str(e)}")
         return old_words
 
-def remove_markdown(text: str) -> str:
-    if not text:
-        return text
+MARKDOWN_RULES = [
+    (re.compile(r'\*\*(.*?)\*\*'), r'\1'),
+    (re.compile(r'__(.*?)__'), r'\1'),
+
+    (re.compile(r'\*(.*?)\*'), r'\1'),
+    (re.compile(r'_(.*?)_'), r'\1'),
 
-    text = re.sub(r'\*\*(.*?)\*\*', r'\1', text)
-    text = re.sub(r'__(.*?)__', r'\1', text)
+    (re.compile(r'^#{1,6}\s+', re.MULTILINE), ''),
 
-    text = re.sub(r'\*(.*?)\*', r'\1', text)
-    text = re.sub(r'_(.*?)_', r'\1', text)
+    (re.compile(r'\[(.*?)\]\(.*?\)'), r'\1'),
 
-    text = re.sub(r'^#{1,6}\s+', '', text, flags=re.MULTILINE)
+    (re.compile(r'!\[.*?\]\(.*?\)'), ''),
 
-    text = re.sub(r'\[(.*?)\]\(.*?\)', r'\1', text)
+    (re.compile(r'```.*?```', re.DOTALL), ''),
+    (re.compile(r'`(.*?)`'), r'\1'),
 
-    text = re.sub(r'!\[.*?\]\(.*?\)', '', text)
+    (re.compile(r'^\s*[-*+]\s+', re.MULTILINE), ''),
+    (re.compile(r'^\s*\d+\.\s+', re.MULTILINE), ''),
 
-    text = re.sub(r'```.*?```', '', text, flags=re.DOTALL)
-    text = re.sub(r'`(.*?)`', r'\1', text)
+    (re.compile(r'^>\s+', re.MULTILINE), ''),
 
-    text = re.sub(r'^\s*[-*+]\s+', '', text, flags=re.MULTILINE)
-    text = re.sub(r'^\s*\d+\.\s+', '', text, flags=re.MULTILINE)
+    (re.compile(r'^[-*_]{3,}\s*$', re.MULTILINE), ''),
 
-    text = re.sub(r'^>\s+', '', text, flags=re.MULTILINE)
+    (re.compile(r'\n{3,}'), '\n\n'),
+]
 
-    text = re.sub(r'^[-*_]{3,}\s*$', '', text, flags=re.MULTILINE)
+def remove_markdown(text: str) -> str:
+    if not text:
+        return text
 
-    text = re.sub(r'\n{3,}', '\n\n', text)
+    for pattern, replacement in MARKDOWN_RULES:
+        text = pattern.sub(replacement, text)
 
-    return text.strip()
\ No newline at end of file
+    return text.strip()
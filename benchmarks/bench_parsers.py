@@ -0,0 +1,81 @@
+"""Парсеры на карте блоков против старых поисков маркеров: python benchmarks/bench_parsers.py"""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ai_generator as new
+from tests.baseline import ai_generator as old
+
+STORY = "Ala ma kota i psa. " * 150
+INTERACTIVE = (
+    f"Start:\n{STORY}\nEnd:\n\ntranslateStart:\n{'Alice has a cat and a dog. ' * 150}\ntranslateEnd:\n\n<words>\n"
+    + "\n".join(f"słowo{i}" for i in range(40)) + "\n</words>\n"
+)
+WORDS = [f"słowo{i}" for i in range(40)]
+PROBLEMS = (
+    "Start:\n" + "\n".join(f"Temat {i};{i * 2}" for i in range(12)) + "\nEnd:\n\nexplanationStart:\n"
+    + "\n".join(f"**Temat {i}:**\n❓ Wyjaśnienie {i} " + "x" * 200 for i in range(12)) + "\nexplanationEnd:\n"
+)
+SUBTOPICS = [[f"Temat {i}", i] for i in range(12)]
+TASK = (
+    f"Start:\n{'Oblicz $x^2$ gdy x=3. ' * 100}\nEnd:\n\nsubtopicsStart:\n"
+    + "\n".join(f"Temat {i}" for i in range(12)) + "\nsubtopicsEnd:\n"
+)
+
+
+def requests(module, clear):
+    """Разбор одного запроса каждого вида; clear - без карт, оставшихся от предыдущего прогона"""
+    def reset():
+        if clear:
+            module._cached_block_map.cache_clear()
+
+    def interactive_task():
+        reset()
+        response, errors = module.remove_markdown(INTERACTIVE), []
+        module.parse_interactive_task_text_response("", response, errors)
+        module.parse_interactive_task_translate_response("", response, errors)
+        module.parse_output_words_response([], WORDS, response, errors, False)
+
+    def problems():
+        reset()
+        errors = []
+        result = module.parse_subtopics_response([], PROBLEMS, errors, "Procent opanowania")
+        module.parse_explanation_response("", PROBLEMS, errors, result, "A", "B", "T", "X")
+
+    def task():
+        reset()
+        errors = []
+        module.parse_task_response("", TASK, errors)
+        module.parse_output_subtopics_response([], SUBTOPICS, TASK, errors)
+
+    def block_parsers():
+        reset()
+        errors = []
+        module.parse_interactive_task_text_response("", INTERACTIVE, errors)
+        module.parse_interactive_task_translate_response("", INTERACTIVE, errors)
+        module.parse_words_output_text_response("", INTERACTIVE, errors)
+
+    return {
+        "3 block parsers on one 7 KB response": block_parsers,
+        "interactive-task request": interactive_task,
+        "problems request": problems,
+        "task request": task,
+    }
+
+
+def best(fn, number=500):
+    return min(timeit.repeat(fn, number=number, repeat=5)) / number * 1e6
+
+
+def main():
+    # Старые парсеры получают нынешний validate_latex: сравнивается только разбор блоков
+    old.validate_latex = new.validate_latex
+    for (label, old_fn), new_fn in zip(requests(old, False).items(), requests(new, True).values()):
+        before, after = best(old_fn), best(new_fn)
+        print(f"{label}: {before:.0f} us -> {after:.0f} us ({before / after:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
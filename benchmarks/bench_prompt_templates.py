@@ -0,0 +1,41 @@
+"""Компилированный шаблон против старого двухпроходного re.sub: python benchmarks/bench_prompt_templates.py"""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from prompt_templates import fill_placeholders
+from tests.baseline.prompt_templates import fill_placeholders as baseline_fill
+
+KEYS = ["subject", "section", "topic", "literature", "information", "subtopics", "errors", "attempt", "note", "words"]
+DATA = {
+    "subject": "Matematyka", "section": "Algebra", "topic": "Równania kwadratowe",
+    "literature": "L" * 5000, "information": "I" * 3000, "note": "N" * 4000,
+    "subtopics": [[f"Podtemat {i}", i] for i in range(60)], "errors": ["e"] * 5, "attempt": 2,
+    "words": [[f"w{i}", i] for i in range(300)]
+}
+
+
+def build_template() -> str:
+    paragraph = "Lorem ipsum dolor sit amet, consectetur adipiscing elit. " * 20
+    template = "".join(
+        f"{paragraph}\n{{${key}$}}\n" + (f"{{#{key}#}}\n" if key in ("subtopics", "errors") else "") for key in KEYS
+    ) * 3
+    return template + "{$missing$} {#missing#}"
+
+
+def main(number: int = 2000):
+    template = build_template()
+    output = fill_placeholders(template, DATA)
+    assert output == baseline_fill(template, DATA)
+
+    old = min(timeit.repeat(lambda: baseline_fill(template, DATA), number=number, repeat=5)) / number * 1e6
+    new = min(timeit.repeat(lambda: fill_placeholders(template, DATA), number=number, repeat=5)) / number * 1e6
+    print(f"template {len(template) / 1000:.1f} KB, {template.count('{$') + template.count('{#')} slots, "
+          f"output {len(output) / 1000:.1f} KB")
+    print(f"old fill_placeholders: {old:.0f} us/call, compiled: {new:.0f} us/call ({old / new:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+"""Скомпилированный regex-сегментатор против старого трёхпроходного: python benchmarks/bench_segmentation.py"""
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from segmentation import abbreviation_registry
+from tests.baseline.segmentation import split_text_into_sentences as baseline_split
+
+PIECES = {
+    "pl": [
+        "Ala ma kota, np. Mruczka.", "Prof. Nowak mieszka przy ul. Długiej 5.", "W 1990 r. wynik wynosił 3.14 proc.",
+        "Czy to prawda?", "Tak!", "To jest m.in. test itp.", "Dr. Kowalski powiedział: „Dobrze”.",
+        "Koniec… Nowy akapit.", "a mała litera.", "Ok."
+    ],
+    "en": [
+        "Mr. Smith met Dr. Jones.", "The U.S. economy grew 2.5 percent.", "Is it e.g. good?", "Yes!",
+        "See fig. 3 for details.", "Next sentence (really).", "\"Quoted\" start.", "etc. and more."
+    ],
+}
+
+
+def main(size: int = 100_000):
+    rng = random.Random(1)
+    for language, pieces in PIECES.items():
+        text = " ".join(rng.choice(pieces) for _ in range(20000))[:size]
+        segmenter = abbreviation_registry.get(language)
+        sentences = segmenter.split(text)
+        assert sentences == baseline_split(text, language)
+
+        old = min(timeit.repeat(lambda: baseline_split(text, language), number=5, repeat=5)) / 5 * 1000
+        new = min(timeit.repeat(lambda: segmenter.split(text), number=5, repeat=5)) / 5 * 1000
+        print(f"{language}: {len(text) / 1000:.0f} KB, {len(sentences)} sentences, "
+              f"old {old:.1f} ms -> new {new:.1f} ms ({old / new:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,9 @@
 # cache_manager.py
 import hashlib
 import json
+import os
+import threading
+from collections import OrderedDict
 from datetime import datetime, timedelta
 from pathlib import Path
 from typing import Dict, Any, Optional, Callable
@@ -10,10 +13,77 @@ import pickle
 logger = logging.getLogger("app_logger")
 
 
+class LRUMemoryCache:
+    """LRU-кэш в памяти процесса, ограниченный числом записей и объёмом в байтах"""
+
+    def __init__(self, max_entries: int = 1024, max_bytes: int = 64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, str]" = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: str, value: str):
+        size = len(value.encode('utf-8'))
+        # Запись больше всего лимита не кладём в память - она останется только на диске
+        if size > self.max_bytes or self.max_entries <= 0:
+            return
+
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = value
+            self._sizes[key] = size
+            self.total_bytes += size
+
+            while len(self._entries) > self.max_entries or self.total_bytes > self.max_bytes:
+                oldest_key = next(iter(self._entries))
+                self._remove(oldest_key)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._sizes.clear()
+            self.total_bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self.total_bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses
+            }
+
+    def _remove(self, key: str):
+        if key in self._entries:
+            del self._entries[key]
+            self.total_bytes -= self._sizes.pop(key)
+
+
 class AICacheManager:
-    """Универсальный менеджер кэша для всех AI запросов"""
+    """Универсальный менеджер кэша для всех AI запросов: LRU в памяти перед кэшем на диске"""
 
-    def __init__(self, cache_dir: str = "ai_cache", cache_ttl_days: int = 30):
+    def __init__(self, cache_dir: str = "ai_cache", cache_ttl_days: int = 30,
+                 memory_max_entries: int = 1024, memory_max_bytes: int = 64 * 1024 * 1024):
         self.cache_dir = Path(cache_dir)
         self.cache_dir.mkdir(exist_ok=True)
 
@@ -23,83 +93,90 @@ class AICacheManager:
 
         self.cache_ttl = timedelta(days=cache_ttl_days)
 
+        # Первый уровень - память процесса, второй - файлы в responses/
+        self.memory = LRUMemoryCache(memory_max_entries, memory_max_bytes)
+
         logger.info(f"✅ Universal Cache manager initialized")
 
-    def _generate_cache_key(self, prompt: str, data: Dict[str, Any], endpoint: str) -> str:
+    def _generate_cache_key(self, prompt: str, endpoint: str, model: str) -> str:
         """
         Генерирует уникальный ключ кэша на основе:
-        - промпта
-        - данных
+        - полностью заполненного промпта (в нём уже subtopics, errors и т.д.)
+        - модели
         - эндпоинта (важно для разных форматов)
         """
-        # Создаём копию данных без изменяемых полей
-        cache_data = {}
-
-        # Добавляем только стабильные поля
-        stable_fields = ['subject', 'section', 'topic', 'difficulty', 'literature']
-        for field in stable_fields:
-            if field in data:
-                cache_data[field] = data[field]
-
-        # Добавляем эндпоинт
-        cache_data['endpoint'] = endpoint
-
-        # Добавляем хеш промпта (промпт определяет формат ответа)
-        prompt_hash = hashlib.md5(prompt.encode('utf-8')).hexdigest()
-        cache_data['prompt_hash'] = prompt_hash
+        hash_input = json.dumps(
+            {"endpoint": endpoint, "model": model, "prompt": prompt},
+            sort_keys=True,
+            ensure_ascii=False
+        )
+        return hashlib.sha256(hash_input.encode('utf-8')).hexdigest()
 
-        # Сортируем для стабильности
-        sorted_data = json.dumps(cache_data, sort_keys=True)
+    def _cache_file(self, cache_key: str) -> Path:
+        """Двухуровневое шардирование: responses/ab/cd/abcd....cache"""
+        return self.response_cache_dir / cache_key[:2] / cache_key[2:4] / f"{cache_key}.cache"
 
-        # Создаём строку для хеширования
-        hash_input = f"{endpoint}_{sorted_data}"
+    def get_cached(self, prompt: str, endpoint: str, model: str = "deepseek-chat") -> Optional[str]:
+        """Получает результат из кэша для конкретного эндпоинта"""
+        cache_key = self._generate_cache_key(prompt, endpoint, model)
 
-        # Возвращаем SHA256 хеш
-        return hashlib.sha256(hash_input.encode('utf-8')).hexdigest()
+        content = self.memory.get(cache_key)
+        if content is not None:
+            logger.info(f"💾 Memory cache HIT [{endpoint}]: {cache_key[:8]}...")
+            return content
 
-    def get_cached(self, prompt: str, data: Dict[str, Any], endpoint: str) -> Optional[str]:
-        """Получает результат из кэша для конкретного эндпоинта"""
-        cache_key = self._generate_cache_key(prompt, data, endpoint)
-        cache_file = self.response_cache_dir / f"{cache_key}.cache"
+        cache_file = self._cache_file(cache_key)
 
-        # Проверяем существование и TTL
-        if cache_file.exists():
+        try:
             # Проверяем возраст файла
             file_time = datetime.fromtimestamp(cache_file.stat().st_mtime)
             if datetime.now() - file_time < self.cache_ttl:
-                try:
-                    with open(cache_file, 'r', encoding='utf-8') as f:
-                        content = f.read()
-                    logger.info(f"💾 Cache HIT [{endpoint}]: {cache_key[:8]}...")
-                    return content
-                except Exception as e:
-                    logger.error(f"Error reading cache {cache_key}: {e}")
-            else:
-                # Удаляем устаревший кэш
-                cache_file.unlink()
-                logger.info(f"🗑️ Cache expired [{endpoint}]: {cache_key[:8]}...")
+                with open(cache_file, 'r', encoding='utf-8') as f:
+                    content = f.read()
+                logger.info(f"💾 Cache HIT [{endpoint}]: {cache_key[:8]}...")
+                self.memory.set(cache_key, content)
+                return content
+
+            # Удаляем устаревший кэш
+            cache_file.unlink(missing_ok=True)
+            logger.info(f"🗑️ Cache expired [{endpoint}]: {cache_key[:8]}...")
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.error(f"Error reading cache {cache_key}: {e}")
 
         logger.info(f"💾 Cache MISS [{endpoint}]: {cache_key[:8]}...")
         return None
 
-    def save_to_cache(self, prompt: str, data: Dict[str, Any], endpoint: str, content: str):
+    def save_to_cache(self, prompt: str, endpoint: str, content: str, model: str = "deepseek-chat"):
         """Сохраняет результат в кэш для конкретного эндпоинта"""
-        cache_key = self._generate_cache_key(prompt, data, endpoint)
-        cache_file = self.response_cache_dir / f"{cache_key}.cache"
+        cache_key = self._generate_cache_key(prompt, endpoint, model)
+        cache_file = self._cache_file(cache_key)
+
+        self.memory.set(cache_key, content)
 
+        # Пишем во временный файл и атомарно переименовываем - недописанный файл никогда не будет прочитан
+        tmp_file = cache_file.with_name(f"{cache_file.name}.{os.getpid()}.{threading.get_ident()}.tmp")
         try:
-            with open(cache_file, 'w', encoding='utf-8') as f:
+            cache_file.parent.mkdir(parents=True, exist_ok=True)
+            with open(tmp_file, 'w', encoding='utf-8') as f:
                 f.write(content)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_file, cache_file)
             logger.info(f"✅ Saved to cache [{endpoint}]: {cache_key[:8]}...")
         except Exception as e:
+            tmp_file.unlink(missing_ok=True)
             logger.error(f"Error saving to cache {cache_key}: {e}")
 
     def clear_cache(self, endpoint: Optional[str] = None):
         """Очищает кэш для конкретного эндпоинта или весь"""
+        self.memory.clear()
+
         if endpoint:
             # Очистить кэш для конкретного эндпоинта
             count = 0
-            for cache_file in self.response_cache_dir.glob("*.cache"):
+            for cache_file in self.response_cache_dir.rglob("*.cache"):
                 # Здесь сложно определить эндпоинт из имени файла
                 # Поэтому просто очищаем всё или добавляем логику
                 cache_file.unlink()
@@ -112,6 +189,23 @@ class AICacheManager:
             self.response_cache_dir.mkdir(exist_ok=True)
             logger.info("🗑️ Cleared all cache")
 
+    def stats(self) -> Dict[str, Any]:
+        """Статистика обоих уровней кэша"""
+        cache_files = list(self.response_cache_dir.rglob("*.cache"))
+        return {
+            "memory": self.memory.stats(),
+            "disk": {
+                "entries": len(cache_files),
+                "bytes": sum(f.stat().st_size for f in cache_files),
+                "cache_dir": str(self.response_cache_dir.absolute())
+            }
+        }
+
 
 # Создаём глобальный экземпляр
-cache_manager = AICacheManager()
\ No newline at end of file
+cache_manager = AICacheManager(
+    cache_dir=os.getenv("AI_CACHE_DIR", "ai_cache"),
+    cache_ttl_days=int(os.getenv("AI_CACHE_TTL_DAYS", 30)),
+    memory_max_entries=int(os.getenv("AI_CACHE_MEMORY_ENTRIES", 1024)),
+    memory_max_bytes=int(os.getenv("AI_CACHE_MEMORY_BYTES", 64 * 1024 * 1024))
+)
\ No newline at end of file
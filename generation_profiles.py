@@ -0,0 +1,81 @@
+# generation_profiles.py
+import math
+import threading
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Callable, Deque, Dict, Optional, Tuple
+
+
+@dataclass(frozen=True)
+class GenerationProfile:
+    """Параметры генерации эндпоинта.
+
+    stop - маркер конца последнего блока ответа: всё, что после него, парсеры отбрасывают,
+    поэтому генерацию можно остановить на нём. Сам маркер API не возвращает - его дописывает
+    restore_stop_marker, если в ответе есть start - маркер начала того же блока.
+    max_tokens - статический потолок до накопления истории размеров ответов."""
+
+    start: Optional[str] = None
+    stop: Optional[str] = None
+    max_tokens: Optional[int] = None
+    validator: Optional[Callable[[], Any]] = None
+
+
+DEFAULT_PROFILE = GenerationProfile()
+
+
+def restore_stop_marker(content: str, start: Optional[str], stop: Optional[str], finish_reason: Optional[str]) -> str:
+    """Возвращает в ответ маркер stop, на котором API остановил генерацию.
+
+    finish_reason "stop" приходит и при срабатывании stop-последовательности, и при обычном конце
+    ответа, поэтому маркер дописывается только после открытого и ещё не закрытого блока start.
+    Иначе ответ возвращается как есть, и парсер сам сообщит об отсутствующей метке."""
+    if not stop or not start or finish_reason != "stop":
+        return content
+
+    opened = content.find(start)
+    if opened == -1 or content.find(stop, opened + len(start)) != -1:
+        return content
+    return f"{content}\n{stop}"
+
+
+class OutputSizeTracker:
+    """Потолок max_tokens по истории размеров принятых ответов (endpoint, model).
+
+    Потолок - квантиль completion_tokens за последние window ответов с запасом headroom;
+    пока истории меньше min_samples, действует значение по умолчанию."""
+
+    def __init__(self, window: int = 200, min_samples: int = 20, quantile: float = 0.99,
+                 headroom: float = 1.5, floor: int = 1024):
+        self.window = window
+        self.min_samples = min_samples
+        self.quantile = quantile
+        self.headroom = headroom
+        self.floor = floor
+        self._sizes: Dict[Tuple[str, str], Deque[int]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, endpoint: str, model: str, completion_tokens: int):
+        if completion_tokens <= 0:
+            return
+        with self._lock:
+            sizes = self._sizes.setdefault((endpoint, model), deque(maxlen=self.window))
+            sizes.append(completion_tokens)
+
+    def ceiling(self, endpoint: str, model: str, default: int) -> int:
+        """Потолок для следующего вызова; никогда не больше default"""
+        with self._lock:
+            sizes = sorted(self._sizes.get((endpoint, model), ()))
+        if len(sizes) < self.min_samples:
+            return default
+
+        index = min(len(sizes) - 1, math.ceil(self.quantile * len(sizes)) - 1)
+        return min(default, max(self.floor, math.ceil(sizes[index] * self.headroom)))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            snapshot = {key: list(sizes) for key, sizes in self._sizes.items()}
+        return {
+            f"{endpoint} {model}": {"samples": len(sizes), "max": max(sizes)}
+            for (endpoint, model), sizes in snapshot.items()
+        }
@@ -0,0 +1,186 @@
+# generation_store.py
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from typing import Any, Dict, Iterable, List, Optional
+import logging
+
+logger = logging.getLogger("app_logger")
+
+# Поля, которые меняются от раунда к раунду и не влияют на результат
+VOLATILE_FIELDS = {"changed", "attempt", "errors", "prompt"}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS generations (
+    key TEXT PRIMARY KEY,
+    endpoint TEXT NOT NULL,
+    prompt_version TEXT NOT NULL,
+    content_hash TEXT NOT NULL,
+    outputs TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_generations_content_hash ON generations (content_hash);
+CREATE INDEX IF NOT EXISTS idx_generations_endpoint ON generations (endpoint);
+"""
+
+# Ограничение SQLite на число параметров в одном запросе
+MAX_BULK_PARAMS = 500
+
+
+def normalize_value(value: Any) -> Any:
+    """Приводит входные данные к каноническому виду: NFC, без крайних пробелов"""
+    if isinstance(value, str):
+        return unicodedata.normalize("NFC", value).strip()
+    if isinstance(value, dict):
+        return {key: normalize_value(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [normalize_value(item) for item in value]
+    return value
+
+
+def _digest(value: Any) -> str:
+    dumped = json.dumps(value, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(dumped.encode("utf-8")).hexdigest()
+
+
+def prompt_version(prompt: str) -> str:
+    """Версия промпта - хэш шаблона: правка шаблона автоматически инвалидирует старые результаты"""
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:16]
+
+
+def generation_key(endpoint: str, payload: Dict[str, Any], output_fields: Iterable[str]) -> str:
+    """Ключ (endpoint, нормализованные входные данные, версия промпта)"""
+    excluded = VOLATILE_FIELDS | set(output_fields)
+    inputs = {key: value for key, value in payload.items() if key not in excluded}
+    return _digest({
+        "endpoint": endpoint,
+        "inputs": normalize_value(inputs),
+        "prompt_version": prompt_version(payload.get("prompt", ""))
+    })
+
+
+def content_hash(outputs: Dict[str, Any]) -> str:
+    return _digest(normalize_value(outputs))
+
+
+class GenerationStore:
+    """Постоянное хранилище принятых результатов генерации в SQLite (WAL)"""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self.enabled = bool(path)
+        self._local = threading.local()
+
+        if self.enabled:
+            directory = os.path.dirname(os.path.abspath(path))
+            os.makedirs(directory, exist_ok=True)
+            connection = self._connection()
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(SCHEMA)
+            logger.info(f"✅ Generation store initialized: {path}")
+
+    def _connection(self) -> sqlite3.Connection:
+        # Отдельное соединение на поток: вызовы идут из пула потоков asyncio.to_thread
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.row_factory = sqlite3.Row
+            self._local.connection = connection
+        return connection
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Возвращает сохранённые выходные поля или None; попадание засчитывается в hits"""
+        outputs = self.get_many([key]).get(key)
+        if outputs is not None:
+            self._connection().execute("UPDATE generations SET hits = hits + 1 WHERE key = ?", (key,))
+        return outputs
+
+    def get_many(self, keys: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Пакетный поиск по ключам генерации; только чтение - hits считает лишь повторное использование в get"""
+        found = {}
+        if not self.enabled or not keys:
+            return found
+
+        connection = self._connection()
+        for start in range(0, len(keys), MAX_BULK_PARAMS):
+            chunk = keys[start:start + MAX_BULK_PARAMS]
+            placeholders = ",".join("?" * len(chunk))
+            rows = connection.execute(
+                f"SELECT key, outputs FROM generations WHERE key IN ({placeholders})", chunk
+            ).fetchall()
+            for row in rows:
+                found[row["key"]] = json.loads(row["outputs"])
+        return found
+
+    def find_by_content(self, hashes: List[str]) -> Dict[str, List[Dict[str, Any]]]:
+        """Пакетный поиск по хэшу содержимого через индекс content_hash"""
+        found: Dict[str, List[Dict[str, Any]]] = {}
+        if not self.enabled or not hashes:
+            return found
+
+        connection = self._connection()
+        for start in range(0, len(hashes), MAX_BULK_PARAMS):
+            chunk = hashes[start:start + MAX_BULK_PARAMS]
+            placeholders = ",".join("?" * len(chunk))
+            rows = connection.execute(
+                f"SELECT key, endpoint, prompt_version, content_hash, created_at FROM generations "
+                f"WHERE content_hash IN ({placeholders})", chunk
+            ).fetchall()
+            for row in rows:
+                found.setdefault(row["content_hash"], []).append({
+                    "key": row["key"],
+                    "endpoint": row["endpoint"],
+                    "prompt_version": row["prompt_version"],
+                    "created_at": row["created_at"]
+                })
+        return found
+
+    def put(self, key: str, endpoint: str, version: str, outputs: Dict[str, Any]):
+        """Сохраняет принятый результат; повторная запись с тем же ключом заменяет старую"""
+        if not self.enabled:
+            return
+
+        try:
+            self._connection().execute(
+                "INSERT OR REPLACE INTO generations (key, endpoint, prompt_version, content_hash, outputs, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, endpoint, version, content_hash(outputs), json.dumps(outputs, ensure_ascii=False), time.time())
+            )
+            logger.info(f"✅ Stored generation [{endpoint}]: {key[:8]}...")
+        except sqlite3.Error as e:
+            logger.error(f"Error storing generation {key}: {e}")
+
+    def clear(self, endpoint: Optional[str] = None) -> int:
+        if not self.enabled:
+            return 0
+
+        connection = self._connection()
+        if endpoint:
+            cursor = connection.execute("DELETE FROM generations WHERE endpoint = ?", (endpoint,))
+        else:
+            cursor = connection.execute("DELETE FROM generations")
+        logger.info(f"🗑️ Cleared {cursor.rowcount} stored generations")
+        return cursor.rowcount
+
+    def stats(self) -> Dict[str, Any]:
+        if not self.enabled:
+            return {"enabled": False}
+
+        rows = self._connection().execute(
+            "SELECT endpoint, COUNT(*) AS entries, SUM(hits) AS hits FROM generations GROUP BY endpoint"
+        ).fetchall()
+        return {
+            "enabled": True,
+            "path": os.path.abspath(self.path),
+            "endpoints": {row["endpoint"]: {"entries": row["entries"], "hits": row["hits"]} for row in rows}
+        }
+
+
+# Создаём глобальный экземпляр; пустой путь отключает хранилище
+generation_store = GenerationStore(os.getenv("AI_GENERATION_STORE") or None)
@@ -0,0 +1,87 @@
+import atexit
+import logging
+import queue
+import random
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import List, Optional
+
+LOG_FORMAT = "%(asctime)s [%(levelname)s] %(message)s"
+
+
+class TruncateFilter(logging.Filter):
+    """Обрезает слишком длинные сообщения, чтобы не засорять поток логов"""
+
+    def __init__(self, max_chars: int):
+        super().__init__()
+        self.max_chars = max_chars
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        message = record.getMessage()
+        if len(message) > self.max_chars:
+            record.msg = f"{message[:self.max_chars]}... [+{len(message) - self.max_chars} chars]"
+            record.args = None
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Пропускает только долю записей, помеченных extra={"sampled": True}; WARNING и выше - всегда"""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if getattr(record, "sampled", False) and record.levelno < logging.WARNING:
+            return random.random() < self.rate
+        return True
+
+
+def _start_listener(handler: logging.Handler) -> QueueHandler:
+    # Запись в поток/файл выполняет отдельный поток слушателя - event loop только кладёт запись в очередь
+    log_queue = queue.SimpleQueue()
+    listener = QueueListener(log_queue, handler, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    _listeners.append(listener)
+    return QueueHandler(log_queue)
+
+
+_listeners: List[QueueListener] = []
+
+
+def setup_logging(
+        level: int = logging.INFO,
+        max_chars: int = 2000,
+        sample_rate: float = 1.0,
+        payload_file: Optional[str] = None,
+        payload_max_bytes: int = 50 * 1024 * 1024,
+        payload_backups: int = 3
+):
+    """Неблокирующее логирование через очередь и отдельный ротируемый sink для полных промптов/ответов"""
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+
+    queue_handler = _start_listener(stream_handler)
+    queue_handler.addFilter(SamplingFilter(sample_rate))
+    queue_handler.addFilter(TruncateFilter(max_chars))
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+
+    app_logger = logging.getLogger("app_logger")
+    app_logger.setLevel(level)
+
+    payload_logger = logging.getLogger("app_logger.payload")
+    payload_logger.propagate = False
+    if payload_file:
+        file_handler = RotatingFileHandler(
+            payload_file, maxBytes=payload_max_bytes, backupCount=payload_backups, encoding="utf-8"
+        )
+        file_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+        payload_logger.addHandler(_start_listener(file_handler))
+        payload_logger.setLevel(logging.DEBUG)
+    else:
+        payload_logger.disabled = True
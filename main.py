@@ -1,53 +1,246 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException, Form, Body, Request
-from pydantic import BaseModel
-from typing import Optional, List, Any, Dict
+from fastapi import FastAPI, UploadFile, File, HTTPException, Form, Body, Request, Response
+from pydantic import BaseModel, ValidationError
+from typing import Optional, List, Any, Dict, AsyncIterator, Tuple
 from dotenv import load_dotenv
 import os
 import re
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse
 import uuid
 import boto3
 import urllib.parse
 from io import BytesIO
 import copy
 import json
+import hashlib
 import aiohttp
 import logging
 import sys
 import asyncio
 import random
-from openai import OpenAI
+import time
+import functools
+import contextlib
+import httpx
+from contextvars import ContextVar
+from openai import AsyncOpenAI, NOT_GIVEN
 from difflib import SequenceMatcher
 from fastapi.responses import StreamingResponse
+from fastapi.encoders import jsonable_encoder
 from collections import Counter
 from azure.core.credentials import AzureKeyCredential
 from azure.cognitiveservices.speech import SpeechConfig, SpeechSynthesizer, AudioConfig, ResultReason
 
-logger = logging.getLogger("app_logger")
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s [%(levelname)s] %(message)s",
-    force=True
-)
+load_dotenv()
+
+from log_config import setup_logging
 
-if not logger.hasHandlers():
-    handler = logging.StreamHandler()
-    handler.setLevel(logging.INFO)
-    logger.addHandler(handler)
+setup_logging(
+    max_chars=int(os.getenv("LOG_MAX_CHARS", 2000)),
+    sample_rate=float(os.getenv("LOG_SAMPLE_RATE", 1.0)),
+    payload_file=os.getenv("AI_PAYLOAD_LOG_FILE") or None
+)
 
-logger.setLevel(logging.INFO)
+logger = logging.getLogger("app_logger")
+payload_logger = logging.getLogger("app_logger.payload")
+
+from cache_manager import cache_manager, LRUMemoryCache
+from single_flight import SingleFlight, Flight
+from admission_control import AdmissionController, AdmissionRejected
+from retry_policy import RetryPolicy, AIDeadlineExceeded, AIFormatViolation, AIOutputTruncated
+import metrics
+from generation_store import generation_store, generation_key, prompt_version, content_hash
+from segmentation import SentenceSegmenter, SPACY_MODELS, COMMON_ABBREVIATIONS, abbreviation_registry
+from prompt_templates import compile_prompt, fill_placeholders
+from ai_generator import StreamValidator, parse_subtopic_line, parse_subtopic_status_line, parse_word_line
+from generation_profiles import GenerationProfile, DEFAULT_PROFILE, OutputSizeTracker, restore_stop_marker
 
-load_dotenv()
 port = int(os.getenv("PORT", 4200))
 api_key = os.environ.get("DEEPSEEK_API_KEY")
 
-client = OpenAI(
+AI_MAX_CONNECTIONS = int(os.getenv("AI_MAX_CONNECTIONS", 64))
+AI_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("AI_MAX_KEEPALIVE_CONNECTIONS", 32))
+AI_KEEPALIVE_EXPIRY = float(os.getenv("AI_KEEPALIVE_EXPIRY", 120))
+AI_CONNECT_TIMEOUT = float(os.getenv("AI_CONNECT_TIMEOUT", 10))
+
+ai_http_client = httpx.AsyncClient(
+    limits=httpx.Limits(
+        max_connections=AI_MAX_CONNECTIONS,
+        max_keepalive_connections=AI_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=AI_KEEPALIVE_EXPIRY
+    ),
+    timeout=httpx.Timeout(float(os.getenv("AI_ATTEMPT_TIMEOUT", 900)), connect=AI_CONNECT_TIMEOUT)
+)
+
+client = AsyncOpenAI(
     api_key=api_key,
     base_url="https://api.deepseek.com",
+    http_client=ai_http_client,
+    max_retries=0
+)
+
+ai_stats = {
+    "in_flight": 0,
+    "completed": 0,
+    "failed": 0,
+    "cancelled": 0,
+    "prompt_chars": 0,
+    "stable_prefix_chars": 0,
+    "prompt_tokens": 0,
+    "cache_hit_tokens": 0
+}
+
+AI_DISCONNECT_POLL_INTERVAL = float(os.getenv("AI_DISCONNECT_POLL_INTERVAL", 1))
+
+AI_ATTEMPT_TIMEOUT = float(os.getenv("AI_ATTEMPT_TIMEOUT", 900))
+AI_DEFAULT_DEADLINE = float(os.getenv("AI_DEFAULT_DEADLINE", 900))
+AI_MAX_DEADLINE = float(os.getenv("AI_MAX_DEADLINE", 900))
+AI_ENDPOINT_DEADLINES = {
+    "/admin/chat-generate": 300,
+    "/admin/chat-theory-generate": 300,
+    "/admin/words-generate": 300
+}
+
+AI_STREAM_VALIDATION = os.getenv("AI_STREAM_VALIDATION", "true").lower() == "true"
+AI_STREAM_START_WITHIN = int(os.getenv("AI_STREAM_START_WITHIN", 2000))
+
+# Модели, которым отправляются stop-последовательности. deepseek-reasoner в цепочке рассуждений
+# сам цитирует маркеры формата, и stop по ним обрезал бы ответ ещё до его начала
+AI_STOP_MODELS = {
+    model.strip() for model in os.getenv("AI_STOP_MODELS", "deepseek-chat").split(",") if model.strip()
+}
+
+# Профили генерации эндпоинтов: stop на маркере конца последнего блока и грамматика для проверки
+# ответа на лету (те же правила строк, что и в парсерах ai_generator). Эндпоинты с несколькими блоками
+# в произвольном порядке (task, vocabluary, interactive-task, problems) stop не получают. Чаты тоже:
+# strip_chat_tags оставляет весь ответ, включая [AI_QUESTION]/[AI_ANSWER] после первого </chat>
+GENERATION_PROFILES: Dict[str, GenerationProfile] = {
+    "/admin/subtopics-generate": GenerationProfile(
+        start="Start:", stop="End:",
+        validator=lambda: StreamValidator(
+            "Start:", "End:", exact=True, line_parser=parse_subtopic_line,
+            duplicate_message="Usunięto powtarzające się podtematy.", start_within=AI_STREAM_START_WITHIN
+        )
+    ),
+    "/admin/subtopics-status-generate": GenerationProfile(
+        start="Start:", stop="End:",
+        validator=lambda: StreamValidator(
+            "Start:", "End:", exact=True, line_parser=parse_subtopic_status_line,
+            duplicate_message="Usunięto powtarzające się podtematy.", start_within=AI_STREAM_START_WITHIN
+        )
+    ),
+    "/admin/chronology-generate": GenerationProfile(
+        start="subtopicsStart:", stop="subtopicsEnd:",
+        validator=lambda: StreamValidator(
+            "subtopicsStart:", "subtopicsEnd:", exact=True,
+            line_parser=functools.partial(parse_subtopic_line, percent_message="Numer Porządkowy"),
+            duplicate_message="Usunięto powtarzające się podtematy.", start_within=AI_STREAM_START_WITHIN
+        )
+    ),
+    "/admin/words-generate": GenerationProfile(
+        start="Start:", stop="End:",
+        validator=lambda: StreamValidator(
+            "Start:", "End:", exact=True, line_parser=parse_word_line,
+            duplicate_message="Usunięto powtarzające się słowy tematyczne.", start_within=AI_STREAM_START_WITHIN
+        )
+    ),
+    "/admin/options-generate": GenerationProfile(
+        start="Start:", stop="End:",
+        validator=lambda: StreamValidator(
+            "Start:", "End:", exact=True, check_latex=True,
+            duplicate_message="Usunięto powtarzające się warianty.", start_within=AI_STREAM_START_WITHIN
+        )
+    ),
+    "/admin/topic-expansion-generate": GenerationProfile(
+        start="noteStart:", stop="noteEnd:",
+        validator=lambda: StreamValidator("noteStart", "noteEnd", check_latex=True)
+    ),
+    "/admin/task-generate": GenerationProfile(
+        validator=lambda: StreamValidator("Start", "End", check_latex=True)
+    ),
+    "/admin/writing-generate": GenerationProfile(
+        start="Start:", stop="End:",
+        validator=lambda: StreamValidator("Start", "End", check_latex=True)
+    ),
+    # Без маркеров parse_solution_response дописывает их сам, поэтому их отсутствие не ошибка
+    "/admin/solution-generate": GenerationProfile(
+        start="Start:", stop="End:",
+        validator=lambda: StreamValidator("Start", "End", check_latex=True)
+    ),
+    "/admin/frequency-generate": GenerationProfile(start="frequencyStart:", stop="frequencyEnd:"),
+    "/admin/exam-generate": GenerationProfile(start="Start:", stop="End:"),
+    "/admin/vocabluary-guide-generate": GenerationProfile(start="Start:", stop="End:"),
+    "/admin/literature-generate": GenerationProfile(start="<literature>", stop="</literature>")
+}
+
+AI_OUTPUT_SIZE_TUNING = os.getenv("AI_OUTPUT_SIZE_TUNING", "true").lower() == "true"
+ai_output_sizes = OutputSizeTracker(
+    window=int(os.getenv("AI_OUTPUT_SIZE_WINDOW", 200)),
+    min_samples=int(os.getenv("AI_OUTPUT_SIZE_MIN_SAMPLES", 20)),
+    headroom=float(os.getenv("AI_OUTPUT_SIZE_HEADROOM", 1.5))
+)
+
+AI_CACHE_ENABLED = os.getenv("AI_CACHE_ENABLED", "true").lower() == "true"
+AI_CACHE_EXCLUDED_ENDPOINTS = {
+    path.strip() for path in os.getenv(
+        "AI_CACHE_EXCLUDED_ENDPOINTS",
+        "/admin/chat-generate,/admin/chat-theory-generate"
+    ).split(",") if path.strip()
+}
+
+ai_single_flight = SingleFlight()
+
+ai_retry_policy = RetryPolicy(
+    base_delay=float(os.getenv("AI_RETRY_BASE_DELAY", 1)),
+    max_delay=float(os.getenv("AI_RETRY_MAX_DELAY", 30)),
+    total_budget=float(os.getenv("AI_RETRY_BUDGET", 1800))
+)
+
+ai_admission = AdmissionController(
+    model_limits={
+        "deepseek-chat": int(os.getenv("AI_MAX_CONCURRENT_CHAT", 16)),
+        "deepseek-reasoner": int(os.getenv("AI_MAX_CONCURRENT_REASONER", 8))
+    },
+    global_limit=int(os.getenv("AI_MAX_CONCURRENT", 24)),
+    max_queue=int(os.getenv("AI_MAX_QUEUE", 64)),
+    max_wait=float(os.getenv("AI_MAX_QUEUE_WAIT", 120))
+)
+
+AI_CONVERSATION_REUSE = os.getenv("AI_CONVERSATION_REUSE", "true").lower() == "true"
+ai_conversations = LRUMemoryCache(
+    max_entries=int(os.getenv("AI_CONVERSATION_ENTRIES", 2048)),
+    max_bytes=int(os.getenv("AI_CONVERSATION_BYTES", 32 * 1024 * 1024))
 )
 
+ai_token_sink: ContextVar[Optional[asyncio.Queue]] = ContextVar("ai_token_sink", default=None)
+
+# Модель последнего вызова request_ai: её ответ и разбирает обработчик
+ai_request_model: ContextVar[str] = ContextVar("ai_request_model", default="unknown")
+
+# Ответы модели, ждущие решения парсера: в кэш они попадают, только если обработчик их принял
+ai_pending_cache_writes: ContextVar[Optional[list]] = ContextVar("ai_pending_cache_writes", default=None)
+
 app = FastAPI()
 
+@app.on_event("shutdown")
+async def close_ai_client():
+    await client.close()
+
+@app.exception_handler(AIDeadlineExceeded)
+async def deadline_exceeded_handler(request: Request, exc: AIDeadlineExceeded):
+    return JSONResponse(
+        status_code=504,
+        content={"detail": "AI request deadline exceeded", "endpoint": exc.endpoint, "deadline_seconds": exc.budget}
+    )
+
+@app.exception_handler(AdmissionRejected)
+async def admission_rejected_handler(request: Request, exc: AdmissionRejected):
+    headers = {"Retry-After": str(int(exc.retry_after))} if exc.retry_after else None
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"detail": f"AI overloaded: {exc}"},
+        headers=headers
+    )
+
 s3 = boto3.client(
     's3',
     aws_access_key_id=os.getenv("AWS_ACCESS_KEY"),
@@ -127,157 +320,540 @@ def is_copy_combined(student_answer, correct_answer,
             seq_similarity >= sequence_threshold and
             key_phrases_match >= key_phrases_threshold)
 
-def fill_placeholders(prompt: str, data: Dict[str, Any]) -> str:
-    def json_replacer(match: re.Match) -> str:
-        key = match.group(1)
-        value = data.get(key, {})
-        return json.dumps(value, ensure_ascii=False)
-
-    def replacer(match: re.Match) -> str:
-        key = match.group(1)
-        value = data.get(key, "")
-
-        if isinstance(value, list):
-            if not value:
-                return f"{key}Start:\n{value}\n{key}End:"
-            lines = []
-            for item in value:
-                if isinstance(item, list):
-                    lines.append(";".join(str(subitem) for subitem in item))
-                else:
-                    lines.append(str(item))
-            return f"{key}Start:\n" + "\n".join(lines) + f"\n{key}End:"
-        return str(value)
+VOLATILE_PLACEHOLDERS = {"errors", "attempt", "userSolution", "userOption"}
 
-    prompt = re.sub(r"\{#(\w+)#\}", json_replacer, prompt)
-    prompt = re.sub(r"\{\$(\w+)\$\}", replacer, prompt)
+# Поля, которые меняются от раунда к раунду одной генерации: в ключе диалога и в исходном промпте
+# они сбрасываются к значениям первого раунда. userSolution/userOption - часть входных данных, их не трогаем
+ROUND_PLACEHOLDER_DEFAULTS = {"errors": [], "attempt": 0}
 
-    return prompt
+AI_STABLE_PREFIX = os.getenv("AI_STABLE_PREFIX", "true").lower() == "true"
 
-async def request_ai(
-        prompt: str,
-        data: Dict[str, Any],
-        request: Request,
-        max_retries: int = 1,
-        stream: bool = False,
-        model: str = "deepseek-chat",
-        web_search = False
-) -> Optional[str]:
-    prompt_filled = fill_placeholders(prompt, data)
+def assemble_prompt(prompt: str, data: Dict[str, Any]) -> Tuple[str, int]:
+    if not AI_STABLE_PREFIX:
+        return fill_placeholders(prompt, data), 0
+    return compile_prompt(prompt).render_stable(data, VOLATILE_PLACEHOLDERS)
+
+AI_SYSTEM_PROMPT = "Jesteś deterministycznym asystentem. ZAWSZE zwracasz odpowiedź w DOKŁADNIE wymaganym formacie. NIGDY nie dodajesz komentarzy, wstępów ani zakończeń."
+
+AI_CORRECTION_PROMPT = "Twoja poprzednia odpowiedź zawiera błędy:\n{errors}\nPopraw je i zwróć CAŁĄ odpowiedź ponownie w DOKŁADNIE wymaganym formacie."
+
+def build_ai_messages(prompt_filled: str) -> List[Dict[str, str]]:
+    return [
+        {"role": "system", "content": AI_SYSTEM_PROMPT},
+        {"role": "user", "content": prompt_filled}
+    ]
+
+def build_correction_messages(base_prompt: str, previous_answer: str, errors: List[str]) -> List[Dict[str, str]]:
+    return [
+        {"role": "system", "content": AI_SYSTEM_PROMPT},
+        {"role": "user", "content": base_prompt},
+        {"role": "assistant", "content": previous_answer},
+        {"role": "user", "content": AI_CORRECTION_PROMPT.format(errors="\n".join(f"- {error}" for error in errors))}
+    ]
 
+def get_max_tokens(model: str) -> int:
     if model == "deepseek-chat":
-        max_tokens = 8192
+        return 8192
+    return 32768
+
+async def stream_ai(
+        messages: List[Dict[str, str]],
+        model: str = "deepseek-chat",
+        max_tokens: Optional[int] = None,
+        web_search = False,
+        usage: Optional[Dict[str, Any]] = None,
+        stop: Optional[str] = None
+) -> AsyncIterator[str]:
+    response = await asyncio.wait_for(
+        client.chat.completions.create(
+            model=model,
+            messages=messages,
+            temperature=0,
+            stream=True,
+            stream_options={"include_usage": True},
+            web_search_options=web_search,
+            max_tokens=max_tokens or get_max_tokens(model),
+            stop=stop or NOT_GIVEN
+        ),
+        timeout=AI_ATTEMPT_TIMEOUT
+    )
+
+    try:
+        async for chunk in response:
+            if usage is not None and chunk.usage:
+                usage.update(read_usage(chunk.usage))
+            # finish_reason нужен вызывающему: "stop" - сработал stop-маркер, "length" - упёрлись в max_tokens
+            if usage is not None and chunk.choices and chunk.choices[0].finish_reason:
+                usage["finish_reason"] = chunk.choices[0].finish_reason
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+    finally:
+        await response.close()
+
+def read_usage(usage) -> Dict[str, int]:
+    if usage is None:
+        return {}
+    return {
+        "prompt_tokens": usage.prompt_tokens or 0,
+        "completion_tokens": usage.completion_tokens or 0,
+        "cached_tokens": getattr(usage, "prompt_cache_hit_tokens", 0) or 0
+    }
+
+def record_ai_call(endpoint: str, model: str, attempt: int, outcome: str, started: float,
+                   usage: Dict[str, int], chars: int, first_token_at: Optional[float] = None):
+    latency = time.monotonic() - started
+    latency_ms = round(latency * 1000)
+    ttft_ms = round((first_token_at - started) * 1000) if first_token_at else None
+
+    metrics.ai_attempts.inc(endpoint, model, outcome)
+    metrics.ai_latency.observe(endpoint, model, value=latency)
+    if first_token_at:
+        metrics.ai_ttft.observe(endpoint, model, value=first_token_at - started)
+    metrics.ai_prompt_tokens.inc(endpoint, model, amount=usage.get("prompt_tokens", 0))
+    metrics.ai_completion_tokens.inc(endpoint, model, amount=usage.get("completion_tokens", 0))
+    metrics.ai_cached_tokens.inc(endpoint, model, amount=usage.get("cached_tokens", 0))
+    if outcome == "ok":
+        metrics.ai_completion_tokens_per_call.observe(endpoint, model, value=usage.get("completion_tokens", 0))
+
+    message = (
+        f"AI call endpoint={endpoint} model={model} attempt={attempt} outcome={outcome} "
+        f"latency_ms={latency_ms} ttft_ms={ttft_ms} prompt_tokens={usage.get('prompt_tokens', 0)} "
+        f"completion_tokens={usage.get('completion_tokens', 0)} cached_tokens={usage.get('cached_tokens', 0)} "
+        f"chars={chars}"
+    )
+    if outcome == "ok":
+        logger.info(message, extra={"sampled": True})
     else:
-        max_tokens = 32768
+        logger.warning(message)
 
-    logger.info(prompt_filled)
+def is_valid_ai_content(content: str) -> bool:
+    if not content or content.isspace() or len(content) < 10:
+        return False
+    return not content.endswith(('...', '--', '[', '{', '('))
+
+async def call_ai_with_retries(
+        messages: List[Dict[str, str]],
+        prompt_key: str,
+        endpoint: str,
+        model: str,
+        max_retries: int,
+        stream: bool,
+        web_search,
+        flight: Flight,
+        budget: float,
+        profile: GenerationProfile = DEFAULT_PROFILE
+) -> Optional[str]:
+    model_max_tokens = get_max_tokens(model)
+    max_tokens = min(model_max_tokens, profile.max_tokens or model_max_tokens)
+    if AI_OUTPUT_SIZE_TUNING:
+        max_tokens = ai_output_sizes.ceiling(endpoint, model, max_tokens)
+    stop = profile.stop if model in AI_STOP_MODELS else None
+    attempt_messages = messages
+    token_sink = flight.tokens
 
-    for attempt in range(max_retries + 1):
-        logger.info(f"[Attempt {attempt + 1}]")
+    payload_logger.info("Prompt [%s]:\n%s", endpoint, messages[-1]["content"])
 
+    ai_stats["in_flight"] += 1
+    try:
+        retry_state = ai_retry_policy.with_retries(max_retries).start(flight.deadline)
+
+        for attempt in range(max_retries + 1):
+            retry_state.extend(flight.deadline)
+            if retry_state.remaining() <= 0:
+                break
+            # Дедлайном таймер попытки ограничивает flight.timeout - и сдвигает, если присоединился запрос с большим
+            attempt_timeout = min(AI_ATTEMPT_TIMEOUT, retry_state.limit - time.monotonic())
+
+            error = None
+            content = ""
+            usage = {}
+            started = time.monotonic()
+            first_token_at = None
+
+            try:
+                if stream:
+                    chunks = []
+                    violations = []
+                    # Последнюю попытку не обрываем: её ответ с ошибками уйдёт в парсер, как и раньше
+                    validator = (
+                        profile.validator() if AI_STREAM_VALIDATION and profile.validator and attempt < max_retries
+                        else None
+                    )
+
+                    token_sink.put_nowait(("attempt", {"attempt": attempt + 1}))
+
+                    async with flight.timeout(attempt_timeout):
+                        async with ai_admission.slot(model):
+                            tokens = stream_ai(attempt_messages, model, max_tokens, web_search, usage, stop)
+                            # aclosing закрывает стрим сразу после break - upstream-запрос отменяется
+                            async with contextlib.aclosing(tokens):
+                                async for text in tokens:
+                                    if first_token_at is None:
+                                        first_token_at = time.monotonic()
+                                    chunks.append(text)
+                                    token_sink.put_nowait(("token", {"text": text}))
+                                    if validator is not None:
+                                        violations = validator.feed(text)
+                                        if violations:
+                                            break
+
+                    content = "".join(chunks).strip()
+                    if violations:
+                        raise AIFormatViolation(endpoint, violations, content)
+                else:
+                    async with flight.timeout(attempt_timeout):
+                        async with ai_admission.slot(model):
+                            response = await client.chat.completions.create(
+                                model=model,
+                                messages=attempt_messages,
+                                temperature=0,
+                                web_search_options=web_search,
+                                stream=False,
+                                max_tokens=max_tokens,
+                                stop=stop or NOT_GIVEN
+                            )
+
+                    usage = read_usage(response.usage)
+                    if response.choices:
+                        usage["finish_reason"] = response.choices[0].finish_reason
+
+                    if response.choices and response.choices[0].message.content:
+                        content = response.choices[0].message.content.strip()
+                    # Присоединившиеся со своим sink получают ответ целиком
+                    token_sink.put_nowait(("token", {"text": content}))
+
+                ai_stats["prompt_tokens"] += usage.get("prompt_tokens", 0)
+                ai_stats["cache_hit_tokens"] += usage.get("cached_tokens", 0)
+
+                finish_reason = usage.get("finish_reason")
+                # Обрезали собственным потолком - повторяем с полным, пока есть попытки
+                if finish_reason == "length" and max_tokens < model_max_tokens and attempt < max_retries:
+                    raise AIOutputTruncated(endpoint, max_tokens, content)
+
+                restored = restore_stop_marker(content, profile.start, stop, finish_reason)
+                if restored != content:
+                    token_sink.put_nowait(("token", {"text": restored[len(content):]}))
+                content = restored
+                payload_logger.info("Response [%s] attempt %d:\n%s", endpoint, attempt + 1, content)
+
+                if is_valid_ai_content(content):
+                    record_ai_call(endpoint, model, attempt + 1, "ok", started, usage, len(content), first_token_at)
+                    ai_output_sizes.observe(endpoint, model, usage.get("completion_tokens", 0))
+
+                    ai_stats["completed"] += 1
+                    return content
+
+                record_ai_call(endpoint, model, attempt + 1, "invalid_response", started, usage, len(content),
+                               first_token_at)
+
+            except AdmissionRejected:
+                raise
+            except AIOutputTruncated as e:
+                error = e
+                record_ai_call(endpoint, model, attempt + 1, "truncated", started, usage, len(e.partial),
+                               first_token_at)
+                logger.warning(f"Output truncated at tuned max_tokens={e.max_tokens}, retrying with {model_max_tokens}")
+                max_tokens = model_max_tokens
+            except AIFormatViolation as e:
+                error = e
+                record_ai_call(endpoint, model, attempt + 1, "aborted", started, usage, len(e.partial),
+                               first_token_at)
+                logger.warning(f"Stream aborted on format violation: {e.errors}")
+                payload_logger.info("Aborted response [%s] attempt %d:\n%s", endpoint, attempt + 1, e.partial)
+                token_sink.put_nowait(("aborted", {"errors": e.errors}))
+
+                # Повтор сразу с ошибкой: модель видит свой обрывок и что в нём не так
+                attempt_messages = messages + [
+                    {"role": "assistant", "content": e.partial},
+                    {"role": "user", "content": AI_CORRECTION_PROMPT.format(
+                        errors="\n".join(f"- {error}" for error in e.errors)
+                    )}
+                ]
+            except Exception as e:
+                error = e
+                record_ai_call(endpoint, model, attempt + 1, f"error:{type(e).__name__}", started, usage, 0,
+                               first_token_at)
+                logger.error(f"Error: {e!r}")
+
+            retry_state.extend(flight.deadline)
+            delay = retry_state.next_delay(attempt, error)
+            if delay is None:
+                break
+
+            metrics.ai_retries.inc(endpoint, model)
+            logger.info(f"Retrying in {delay:.2f}s after {retry_state.last_kind}")
+            await asyncio.sleep(delay)
+
+        ai_stats["failed"] += 1
+        if retry_state.remaining() <= 0:
+            logger.error(f"Deadline of {budget:.1f}s exceeded for {endpoint}")
+            raise AIDeadlineExceeded(endpoint, budget)
+
+        logger.error(f"All attempts failed ({attempt + 1} of {max_retries + 1}, last error: {retry_state.last_kind})")
+        return None
+    finally:
+        ai_stats["in_flight"] -= 1
+
+async def watch_disconnect(request: Request):
+    while not await request.is_disconnected():
+        await asyncio.sleep(AI_DISCONNECT_POLL_INTERVAL)
+
+async def run_until_disconnected(coro, request: Optional[Request], deadline: float, endpoint: str, budget: float):
+    task = asyncio.ensure_future(coro)
+    watchers = {asyncio.create_task(watch_disconnect(request))} if request is not None else set()
+    try:
+        # Небольшой запас, чтобы сама попытка успела завершиться по своему таймауту
+        timeout = max(0.0, deadline - time.monotonic()) + 1
+        done, _ = await asyncio.wait({task, *watchers}, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+        if task in done:
+            return task.result()
+
+        task.cancel()
+        await asyncio.wait({task})
+
+        if not done:
+            raise AIDeadlineExceeded(endpoint, budget)
+
+        ai_stats["cancelled"] += 1
+        logger.info("Client disconnected, upstream AI call cancelled")
+        raise HTTPException(status_code=499, detail="Client disconnected")
+    finally:
+        for watcher in watchers:
+            watcher.cancel()
+        if not task.done():
+            task.cancel()
+
+def get_request_deadline(request: Optional[Request], endpoint: str, budget: Optional[float] = None):
+    if request is not None and hasattr(request.state, "ai_deadline"):
+        return request.state.ai_deadline, request.state.ai_budget
+
+    if budget is None:
+        header = request.headers.get("x-request-timeout") if request is not None else None
         try:
-            if stream:
-                response = await asyncio.wait_for(
-                    asyncio.to_thread(
-                        lambda: client.chat.completions.create(
-                            model=model,
-                            messages=[
-                                {"role": "system", "content": "Jesteś deterministycznym asystentem. ZAWSZE zwracasz odpowiedź w DOKŁADNIE wymaganym formacie. NIGDY nie dodajesz komentarzy, wstępów ani zakończeń."},
-                                {"role": "user", "content": prompt_filled}
-                            ],
-                            temperature=0,
-                            stream=True,
-                            web_search_options=web_search,
-                            max_tokens=max_tokens
-                        )
-                    ),
-                    timeout=900
+            budget = float(header) if header else None
+        except ValueError:
+            budget = None
+    if budget is None or budget <= 0:
+        budget = AI_ENDPOINT_DEADLINES.get(endpoint, AI_DEFAULT_DEADLINE)
+    budget = min(budget, AI_MAX_DEADLINE)
+    deadline = time.monotonic() + budget
+
+    # Один бюджет на весь HTTP-запрос, даже если эндпоинт вызывает request_ai несколько раз
+    if request is not None:
+        request.state.ai_deadline = deadline
+        request.state.ai_budget = budget
+    return deadline, budget
+
+def remember_conversation(conversation_key: Optional[str], answer: Optional[str], errors: List[str]):
+    if conversation_key is None or not answer:
+        return
+    ai_conversations.set(conversation_key, json.dumps({"answer": answer, "errors": len(errors)}, ensure_ascii=False))
+
+def get_ai_endpoint(request: Optional[Request], data: Dict[str, Any]) -> str:
+    if request is None:
+        return data.get('endpoint', 'unknown')
+    return request.url.path.removesuffix("/stream").removesuffix("/converge")
+
+def is_force_regen(request: Optional[Request]) -> bool:
+    if request is None:
+        return False
+    value = request.headers.get("x-force-regen") or request.query_params.get("force_regen") or ""
+    return value.lower() in ("1", "true", "yes")
+
+def record_parse_errors(request: Request, data: Dict[str, Any], previous_errors: List[str]):
+    """Считает раунд, в котором парсер добавил ошибки, по эндпоинту и модели разобранного ответа"""
+    if len(data['errors']) > len(previous_errors):
+        metrics.ai_parse_failures.inc(get_ai_endpoint(request, data), ai_request_model.get())
+
+async def cache_response(prompt_key: str, endpoint: str, content: str, model: str):
+    """Кэширует ответ сразу или, внутри persist_generation, после того как его принял парсер"""
+    pending = ai_pending_cache_writes.get()
+    if pending is None:
+        await asyncio.to_thread(cache_manager.save_to_cache, prompt_key, endpoint, content, model)
+    else:
+        pending.append((prompt_key, endpoint, content, model))
+
+def persist_generation(*output_fields: str):
+    """Отдаёт принятый результат из generation_store, если входные данные и промпт не менялись.
+
+    Ответы модели попадают в кэш запросов только вместе с принятым результатом: отклонённый парсером
+    ответ иначе возвращался бы из кэша каждой следующей генерации той же темы."""
+    def decorator(handler):
+        @functools.wraps(handler)
+        async def wrapper(data: BaseModel, request: Request):
+            if data.changed == "false":
+                return await handler(data, request)
+
+            payload = data.dict()
+            endpoint = get_ai_endpoint(request, payload)
+            key = generation_key(endpoint, payload, output_fields) if generation_store.enabled else None
+
+            if key is not None and not is_force_regen(request):
+                stored = await asyncio.to_thread(generation_store.get, key)
+                if stored is not None:
+                    logger.info(f"💾 Generation store HIT [{endpoint}]: {key[:8]}...")
+                    return type(data)(**{**payload, **stored, "changed": "false"})
+
+            pending = []
+            pending_token = ai_pending_cache_writes.set(pending)
+            try:
+                result = await handler(data, request)
+            finally:
+                ai_pending_cache_writes.reset(pending_token)
+
+            if result.changed != "false":
+                if pending:
+                    logger.info(f"[{endpoint}] {len(pending)} rejected response(s) not cached")
+                return result
+
+            for entry in pending:
+                await asyncio.to_thread(cache_manager.save_to_cache, *entry)
+            if key is not None:
+                outputs = {field: getattr(result, field) for field in output_fields}
+                await asyncio.to_thread(
+                    generation_store.put, key, endpoint, prompt_version(payload.get("prompt", "")), outputs
                 )
+            return result
 
-                chunks = []
-                current_segment = ""
-                chunk_count = 0
-
-                for chunk in response:
-                    chunk_count += 1
-
-                    try:
-                        if (chunk and chunk.choices and chunk.choices[0].delta.content):
-                            text = chunk.choices[0].delta.content
-                            if text:
-                                chunks.append(text)
-                                current_segment += text
-
-                                if len(current_segment) > 80 and (
-                                        '\n' in current_segment or '. ' in current_segment[-20:]):
-                                    logger.info(current_segment.strip())
-                                    current_segment = ""
-                    except AttributeError:
-                        continue
-
-                if current_segment.strip():
-                    logger.info(current_segment.strip())
-
-                content = "".join(chunks).strip()
-            else:
-                response = await asyncio.wait_for(
-                    asyncio.to_thread(
-                        lambda: client.chat.completions.create(
-                            model=model,
-                            messages=[
-                                {"role": "system", "content": "Jesteś deterministycznym asystentem. ZAWSZE zwracasz odpowiedź w DOKŁADNIE wymaganym formacie. NIGDY nie dodajesz komentarzy, wstępów ani zakończeń."},
-                                {"role": "user", "content": prompt_filled}
-                            ],
-                            temperature=0,
-                            web_search_options=web_search,
-                            stream=False,
-                            max_tokens=max_tokens
-                        )
-                    ),
-                    timeout=900
-                )
+        wrapper.output_fields = output_fields
+        return wrapper
+    return decorator
 
-                if response.choices and response.choices[0].message.content:
-                    content = response.choices[0].message.content.strip()
-                else:
-                    content = ""
+async def request_ai(
+        prompt: str,
+        data: Dict[str, Any],
+        request: Request,
+        max_retries: int = 1,
+        stream: bool = False,
+        model: str = "deepseek-chat",
+        web_search = False,
+        use_cache: bool = True,
+        force_regen: bool = False,
+        timeout: Optional[float] = None
+) -> Optional[str]:
+    prompt_filled, stable_prefix = assemble_prompt(prompt, data)
+    token_sink = ai_token_sink.get()
+
+    endpoint = get_ai_endpoint(request, data)
+    profile = GENERATION_PROFILES.get(endpoint, DEFAULT_PROFILE)
+    validate = AI_STREAM_VALIDATION and profile.validator is not None and max_retries > 0
+    stream = stream or token_sink is not None or validate
+    use_cache = use_cache and AI_CACHE_ENABLED and endpoint not in AI_CACHE_EXCLUDED_ENDPOINTS
+    force_regen = force_regen or is_force_regen(request)
+
+    messages = build_ai_messages(prompt_filled)
+    prompt_key = prompt_filled
+
+    ai_stats["prompt_chars"] += len(prompt_filled)
+    ai_stats["stable_prefix_chars"] += stable_prefix
+    logger.info(f"[{endpoint}] Prompt {len(prompt_filled)} chars, stable prefix {stable_prefix} chars")
+    conversation_key = None
+    errors = data.get("errors") or []
+    ai_request_model.set(model)
+
+    if AI_CONVERSATION_REUSE and isinstance(errors, list):
+        base_prompt, _ = assemble_prompt(prompt, {**data, **ROUND_PLACEHOLDER_DEFAULTS})
+        conversation_key = hashlib.sha256(f"{endpoint}\n{model}\n{base_prompt}".encode("utf-8")).hexdigest()
+        previous = ai_conversations.get(conversation_key) if errors else None
+
+        if previous is not None:
+            previous = json.loads(previous)
+            new_errors = errors[previous["errors"]:] or errors
+            messages = build_correction_messages(base_prompt, previous["answer"], new_errors)
+            prompt_key = json.dumps(messages, ensure_ascii=False)
+            logger.info(f"Correction turn with {len(new_errors)} error(s) instead of full prompt")
+
+    if use_cache and not force_regen:
+        cached = await asyncio.to_thread(cache_manager.get_cached, prompt_key, endpoint, model)
+        if cached:
+            metrics.ai_cache_hits.inc(endpoint, model)
+            if token_sink is not None:
+                token_sink.put_nowait(("token", {"text": cached, "cached": True}))
+            remember_conversation(conversation_key, cached, errors)
+            return cached
+
+    flight_key = hashlib.sha256(f"{model}\n{prompt_key}".encode("utf-8")).hexdigest()
+
+    deadline, budget = get_request_deadline(request, endpoint, timeout)
+
+    # Общий вызов не видит ContextVar-ы запроса: токены он раздаёт в sink каждого ожидающего,
+    # а дедлайн берёт самый поздний из них
+    content, shared = await run_until_disconnected(
+        ai_single_flight.do(
+            flight_key,
+            lambda flight: call_ai_with_retries(
+                messages, prompt_key, endpoint, model, max_retries, stream, web_search, flight, budget, profile
+            ),
+            deadline,
+            token_sink
+        ),
+        request,
+        deadline,
+        endpoint,
+        budget
+    )
 
-                if content:
-                    logger.info(f"Response: {content}")
+    remember_conversation(conversation_key, content, errors)
 
-            if content:
-                if len(content) < 10:
-                    if attempt < max_retries:
-                        wait_time = 2 ** attempt
-                        await asyncio.sleep(wait_time)
-                    continue
+    if use_cache and content and not shared:
+        await cache_response(prompt_key, endpoint, content, model)
 
-                if not content or content.isspace():
-                    if attempt < max_retries:
-                        wait_time = 2 ** attempt
-                        await asyncio.sleep(wait_time)
-                    continue
+    return content
 
-                if content.endswith(('...', '--', '[', '{', '(')):
-                    if attempt < max_retries:
-                        wait_time = 2 ** attempt
-                        await asyncio.sleep(wait_time)
-                    continue
+def ai_error_payload(e: Exception) -> Dict[str, Any]:
+    if isinstance(e, HTTPException):
+        return {"status_code": e.status_code, "detail": e.detail}
+    if isinstance(e, AdmissionRejected):
+        return {"status_code": e.status_code, "detail": f"AI overloaded: {e}", "retry_after": e.retry_after}
+    if isinstance(e, AIDeadlineExceeded):
+        return {"status_code": 504, "detail": "AI request deadline exceeded", "deadline_seconds": e.budget}
+    if isinstance(e, ValidationError):
+        return {"status_code": 422, "detail": jsonable_encoder(e.errors())}
 
-                return content
+    logger.error(f"AI generate error: {e!r}")
+    return {"status_code": 500, "detail": str(e)}
 
-            if attempt < max_retries:
-                wait_time = 2 ** attempt
-                await asyncio.sleep(wait_time)
+def format_sse(event: str, payload: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
 
-        except Exception as e:
-            logger.error(f"Error: {e}")
-            if attempt < max_retries:
-                wait_time = 2 ** attempt
-                await asyncio.sleep(wait_time)
+def sse_generate(handler, data: BaseModel, request: Request) -> StreamingResponse:
+    queue = asyncio.Queue()
+
+    async def run_handler():
+        try:
+            return await handler(data, request)
+        finally:
+            queue.put_nowait(None)
+
+    sink_token = ai_token_sink.set(queue)
+    try:
+        task = asyncio.create_task(run_handler())
+    finally:
+        ai_token_sink.reset(sink_token)
 
-    logger.error(f"All {max_retries + 1} attempts failed")
-    return None
+    async def events():
+        try:
+            while True:
+                item = await queue.get()
+                if item is None:
+                    break
+                event, payload = item
+                yield format_sse(event, payload)
+
+            try:
+                result = await task
+                yield format_sse("result", jsonable_encoder(result))
+            except Exception as e:
+                yield format_sse("error", ai_error_payload(e))
+        finally:
+            if not task.done():
+                task.cancel()
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 class PromptImageRequest(BaseModel):
     prompt: str
@@ -288,11 +864,13 @@ class PromptRequest(BaseModel):
     prompt: str
 
 class SplitIntoSentencesRequest(BaseModel):
-    text: str
-    language: Optional[str]
+    text: Optional[str] = None
+    texts: Optional[List[str]] = None
+    language: Optional[str] = None
 
 class SplitIntoSentencesResponse(BaseModel):
     sentences: list
+    results: Optional[List[List[str]]] = None
 
 class TranscriptionPartResponse(BaseModel):
     part_id: int
@@ -585,6 +1163,92 @@ class PromptImageRequest(BaseModel):
 async def root():
     return {"message": f"Serwer działa na porcie {port}"}
 
+@app.get("/admin/ai-stats")
+async def get_ai_stats():
+    return {
+        **ai_stats,
+        "single_flight": ai_single_flight.stats(),
+        "admission": ai_admission.stats(),
+        "max_connections": AI_MAX_CONNECTIONS,
+        "max_keepalive_connections": AI_MAX_KEEPALIVE_CONNECTIONS,
+        "sentence_segmenter": {"engine": SENTENCE_SEGMENTER, "pipelines": sentence_segmenter.stats()},
+        "output_sizes": ai_output_sizes.stats(),
+        "keepalive_expiry": AI_KEEPALIVE_EXPIRY
+    }
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    return PlainTextResponse(metrics.registry.render(), media_type="text/plain; version=0.0.4")
+
+class CacheClearRequest(BaseModel):
+    endpoint: Optional[str] = None
+
+@app.post("/admin/cache/clear")
+async def clear_cache(data: CacheClearRequest):
+    try:
+        await asyncio.to_thread(cache_manager.clear_cache, data.endpoint)
+        return {"status": "success", "message": "Cache cleared"}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/admin/cache/stats")
+async def cache_stats():
+    try:
+        return await asyncio.to_thread(cache_manager.stats)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+class GenerationLookupItem(BaseModel):
+    endpoint: str
+    data: Dict[str, Any]
+
+class GenerationLookupRequest(BaseModel):
+    items: List[GenerationLookupItem] = []
+    contentHashes: List[str] = []
+
+@app.post("/admin/generation-store/lookup")
+async def generation_store_lookup(data: GenerationLookupRequest):
+    if not generation_store.enabled:
+        raise HTTPException(status_code=404, detail="Generation store is disabled")
+
+    keys = []
+    for item in data.items:
+        entry = GENERATE_ENDPOINTS.get(item.endpoint)
+        if entry is None:
+            raise HTTPException(status_code=400, detail=f"Nieznany endpoint: {item.endpoint}")
+        handler, model_cls = entry
+        # Ключ строится так же, как в persist_generation: из данных после валидации моделью эндпоинта
+        try:
+            payload = model_cls(**item.data).dict()
+        except ValidationError as e:
+            raise HTTPException(status_code=422, detail=jsonable_encoder(e.errors()))
+        keys.append(generation_key(item.endpoint, payload, getattr(handler, "output_fields", ())))
+
+    found = await asyncio.to_thread(generation_store.get_many, keys)
+    by_content = await asyncio.to_thread(generation_store.find_by_content, data.contentHashes)
+
+    return {
+        "items": [
+            {
+                "key": key,
+                "found": key in found,
+                "outputs": found.get(key),
+                "contentHash": content_hash(found[key]) if key in found else None
+            }
+            for key in keys
+        ],
+        "contentHashes": {value: by_content.get(value, []) for value in data.contentHashes}
+    }
+
+@app.get("/admin/generation-store/stats")
+async def generation_store_stats():
+    return await asyncio.to_thread(generation_store.stats)
+
+@app.post("/admin/generation-store/clear")
+async def generation_store_clear(data: CacheClearRequest):
+    removed = await asyncio.to_thread(generation_store.clear, data.endpoint)
+    return {"status": "success", "removed": removed}
+
 @app.post("/admin/full-plan-generate")
 def full_plan_generate(data: PromptRequest):
     try:
@@ -593,53 +1257,55 @@ def full_plan_generate(data: PromptRequest):
     except RuntimeError as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-COMMON_ABBREVIATIONS = {
-    "pl": [
-        "np.", "itp.", "tj.", "dr.", "mgr.", "prof.", "ul.", "al.", "św.",
-        "r.", "god.", "p.", "nr.", "ok.", "m.in.", "cdn.", "tzn."
-    ],
-    "en": [
-        "mr.", "mrs.", "ms.", "dr.", "prof.", "inc.", "ltd.", "jr.", "sr.",
-        "st.", "vs.", "u.s.", "u.k.", "e.g.", "i.e.", "etc.", "fig."
-    ],
-}
-
 def split_text_into_sentences(text: str, language: str = "en") -> list[str]:
-    if not text or not isinstance(text, str):
-        return []
-
-    abbreviations = COMMON_ABBREVIATIONS.get(language.lower(), [])
-    abbrev_pattern = re.compile(
-        r"\b(" + "|".join([re.escape(a) for a in abbreviations]) + r")",
-        re.IGNORECASE
-    )
-
-    text_protected = abbrev_pattern.sub(lambda m: m.group(1).replace(".", "§"), text)
-
-    text_protected = re.sub(r"(\d)\.(\d)", r"\1§\2", text_protected)
-
-    parts = re.split(
-        r"(?<=[.!?…])\s+(?=[\"“”'«»„\(]*[A-ZА-ЯŁŚŹŻĆŃ])",
-        text_protected
-    )
+    return abbreviation_registry.get(language or "en").split(text)
 
-    sentences = []
-    for p in parts:
-        s = p.strip().replace("§", ".")
-        if s:
-            if sentences and (
-                len(s) < 3 or (s and s[0].islower())
-            ):
-                sentences[-1] += " " + s
-            else:
-                sentences.append(s)
+class SentenceAbbreviationsRequest(BaseModel):
+    language: str
+    abbreviations: List[str]
+    replace: bool = False
+
+@app.post("/admin/sentence-abbreviations")
+def set_sentence_abbreviations(data: SentenceAbbreviationsRequest):
+    abbreviations = [a.strip() for a in data.abbreviations if a.strip()]
+    if any(not a.endswith(".") for a in abbreviations):
+        raise HTTPException(status_code=400, detail="Każdy skrót musi kończyć się kropką")
+
+    abbreviation_registry.set_custom(data.language, abbreviations, data.replace)
+    sentence_segmenter.invalidate(data.language)
+    return {"language": data.language.lower(), "abbreviations": abbreviation_registry.abbreviations(data.language)}
+
+@app.get("/admin/sentence-abbreviations")
+def get_sentence_abbreviations():
+    return {"builtin": COMMON_ABBREVIATIONS, "custom": abbreviation_registry.custom()}
+
+SENTENCE_SEGMENTER = os.getenv("SENTENCE_SEGMENTER", "spacy").lower()
+
+sentence_segmenter = SentenceSegmenter(
+    SPACY_MODELS,
+    batch_size=int(os.getenv("SENTENCE_SEGMENTER_BATCH_SIZE", 64)),
+    fallback=split_text_into_sentences,
+    abbreviations=abbreviation_registry.custom_for
+)
 
-    return sentences
+def split_texts_into_sentences(texts: List[str], language: str = "en") -> List[List[str]]:
+    if SENTENCE_SEGMENTER == "spacy":
+        return sentence_segmenter.split_many(texts, language)
+    return [split_text_into_sentences(text, language) for text in texts]
 
 @app.post("/admin/split-into-sentences", response_model=SplitIntoSentencesResponse)
 def split_into_sentences(data: SplitIntoSentencesRequest):
+    if data.text is None and data.texts is None:
+        raise HTTPException(status_code=400, detail="Brak tekstu do podziału")
+
     try:
-        return SplitIntoSentencesResponse(sentences=split_text_into_sentences(data.text, data.language))
+        language = data.language or "en"
+
+        if data.texts is not None:
+            results = split_texts_into_sentences(data.texts, language)
+            return SplitIntoSentencesResponse(sentences=results[0] if results else [], results=results)
+
+        return SplitIntoSentencesResponse(sentences=split_texts_into_sentences([data.text], language)[0])
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Błąd serwera: {str(e)}")
 
@@ -710,6 +1376,7 @@ async def generate_tts(data: TTSRequest):
             raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/admin/subtopics-generate")
+@persist_generation("subtopics")
 async def subtopics_generate(data: SubtopicsGenerator, request: Request):
     old_data = copy.deepcopy(data.dict())
 
@@ -730,6 +1397,7 @@ async def subtopics_generate(data: SubtopicsGenerator, request: Request):
         previous_errors = copy.deepcopy(old_data['errors'])
         new_data['subtopics'] = parse_subtopics_response(old_data['subtopics'], response, old_data['errors'])
         new_data['errors'] = old_data['errors']
+        record_parse_errors(request, old_data, previous_errors)
         new_data['attempt'] = new_data['attempt'] + 1
 
         if sorted(previous_errors) == sorted(new_data['errors']):
@@ -743,6 +1411,7 @@ async def subtopics_generate(data: SubtopicsGenerator, request: Request):
         return SubtopicsGenerator(**old_data)
 
 @app.post("/admin/subtopics-status-generate")
+@persist_generation("subtopics")
 async def subtopics_status_generate(data: SubtopicsStatusGenerator, request: Request):
     old_data = copy.deepcopy(data.dict())
 
@@ -764,6 +1433,7 @@ async def subtopics_status_generate(data: SubtopicsStatusGenerator, request: Req
         new_data['subtopics'] = parse_subtopics_status_response(old_data['subtopics'], response, old_data['errors'])
         new_data['errors'] = old_data['errors']
 
+        record_parse_errors(request, old_data, previous_errors)
         new_data['attempt'] = new_data['attempt'] + 1
 
         if sorted(previous_errors) == sorted(new_data['errors']):
@@ -777,6 +1447,7 @@ async def subtopics_status_generate(data: SubtopicsStatusGenerator, request: Req
         return SubtopicsStatusGenerator(**old_data)
 
 @app.post("/admin/topic-expansion-generate")
+@persist_generation("note")
 async def topic_expansion_generate(data: TopicExpansionGenerator, request: Request):
     old_data = copy.deepcopy(data.dict())
 
@@ -800,6 +1471,7 @@ async def topic_expansion_generate(data: TopicExpansionGenerator, request: Reque
 
         logger.info(previous_errors)
         logger.info(new_data['errors'])
+        record_parse_errors(request, old_data, previous_errors)
         new_data['attempt'] = new_data['attempt'] + 1
 
         if new_data['note'] != "" and sorted(previous_errors) == sorted(new_data['errors']):
@@ -813,6 +1485,7 @@ async def topic_expansion_generate(data: TopicExpansionGenerator, request: Reque
         return TopicExpansionGenerator(**old_data)
 
 @app.post("/admin/solution-generate")
+@persist_generation("solution")
 async def solution_generate(data: SolutionGenerator, request: Request):
     old_data = copy.deepcopy(data.dict())
 
@@ -836,6 +1509,7 @@ async def solution_generate(data: SolutionGenerator, request: Request):
 
         logger.info(previous_errors)
         logger.info(new_data['errors'])
+        record_parse_errors(request, old_data, previous_errors)
         new_data['attempt'] = new_data['attempt'] + 1
 
         if new_data['solution'] != "" and sorted(previous_errors) == sorted(new_data['errors']):
@@ -849,6 +1523,7 @@ async def solution_generate(data: SolutionGenerator, request: Request):
         return SolutionGenerator(**old_data)
 
 @app.post("/admin/chronology-generate")
+@persist_generation("outputSubtopics")
 async def chronology_generate(data: ChronologyGenerator, request: Request):
     old_data = copy.deepcopy(data.dict())
 
@@ -878,6 +1553,7 @@ async def chronology_generate(data: ChronologyGenerator, request: Request):
 
         logger.info(previous_errors)
         logger.info(new_data['errors'])
+        record_parse_errors(request, old_data, previous_errors)
         new_data['attempt'] = new_data['attempt'] + 1
 
         if sorted(previous_errors) == sorted(new_data['errors']):
@@ -891,6 +1567,7 @@ async def chronology_generate(data: ChronologyGenerator, request: Request):
         return ChronologyGenerator(**old_data)
 
 @app.post("/admin/frequency-generate")
+@persist_generation("frequency")
 async def frequency_generate(data: FrequencyGenerator, request: Request):
     old_data = copy.deepcopy(data.dict())
 
@@ -914,6 +1591,7 @@ async def frequency_generate(data: FrequencyGenerator, request: Request):
 
         logger.info(previous_errors)
         logger.info(new_data['errors'])
+        record_parse_errors(request, old_data, previous_errors)
         new_data['attempt'] = new_data['attempt'] + 1
 
         if new_data['frequency'] != 0 and sorted(previous_errors) == sorted(new_data['errors']):
@@ -927,6 +1605,7 @@ async def frequency_generate(data: FrequencyGenerator, request: Request):
         return FrequencyGenerator(**old_data)
 
 @app.post("/admin/task-generate")
+@persist_generation("text", "outputSubtopics")
 async def task_generate(data: TaskGenerator, request: Request):
     old_data = copy.deepcopy(data.dict())
 
@@ -942,7 +1621,7 @@ async def task_generate(data: TaskGenerator, request: Request):
         if await request.is_disconnected():
             raise HTTPException(status_code=499, detail="Client disconnected")
 
-        logger.info(old_data['literature'])
+        payload_logger.info("Literature:\n%s", old_data['literature'])
 
         response = await request_ai(old_data['prompt'], old_data, request, stream=False)
 
@@ -955,6 +1634,7 @@ async def task_generate(data: TaskGenerator, request: Request):
         new_data['outputSubtopics'] = parse_output_subtopics_response(old_data['outputSubtopics'], old_data['subtopics'],
                                                                        response, old_data['errors'])
         new_data['errors'] = old_data['errors']
+        record_parse_errors(request, old_data, previous_errors)
         new_data['attempt'] = new_data['attempt'] + 1
 
         if new_data['text'] != "" and sorted(previous_errors) == sorted(new_data['errors']):
@@ -968,6 +1648,7 @@ async def task_generate(data: TaskGenerator, request: Request):
         return TaskGenerator(**old_data)
 
 @app.post("/admin/exam-generate")
+@persist_generation("outputTopics")
 async def exam_generate(data: ExamGenerator, request: Request):
     old_data = copy.deepcopy(data.dict())
 
@@ -992,6 +1673,7 @@ async def exam_generate(data: ExamGenerator, request: Request):
         new_data['outputTopics'] = parse_output_exam_topics_response(old_data['outputTopics'],
                                                                        response, old_data['errors'])
         new_data['errors'] = old_data['errors']
+        record_parse_errors(request, old_data, previous_errors)
         new_data['attempt'] = new_data['attempt'] + 1
 
         if sorted(previous_errors) == sorted(new_data['errors']):
@@ -1005,6 +1687,7 @@ async def exam_generate(data: ExamGenerator, request: Request):
         return ExamGenerator(**old_data)
 
 @app.post("/admin/writing-generate")
+@persist_generation("text")
 async def writing_generate(data: WritingGenerator, request: Request):
     old_data = copy.deepcopy(data.dict())
 
@@ -1019,7 +1702,7 @@ async def writing_generate(data: WritingGenerator, request: Request):
         if await request.is_disconnected():
             raise HTTPException(status_code=499, detail="Client disconnected")
 
-        logger.info(old_data['literature'])
+        payload_logger.info("Literature:\n%s", old_data['literature'])
 
         response = await request_ai(old_data['prompt'], old_data, request, stream=False)
 
@@ -1030,6 +1713,7 @@ async def writing_generate(data: WritingGenerator, request: Request):
         previous_errors = copy.deepcopy(old_data['errors'])
         new_data['text'] = parse_task_response(old_data['text'], response, old_data['errors'])
         new_data['errors'] = old_data['errors']
+        record_parse_errors(request, old_data, previous_errors)
         new_data['attempt'] = new_data['attempt'] + 1
 
         if new_data['text'] != "" and sorted(previous_errors) == sorted(new_data['errors']):
@@ -1043,6 +1727,7 @@ async def writing_generate(data: WritingGenerator, request: Request):
         return WritingGenerator(**old_data)
 
 @app.post("/admin/vocabluary-generate")
+@persist_generation("outputText", "outputWords")
 async def vocabluary_generate(data: VocabluaryGenerator, request: Request):
     old_data = copy.deepcopy(data.dict())
 
@@ -1069,6 +1754,7 @@ async def vocabluary_generate(data: VocabluaryGenerator, request: Request):
         new_data['outputWords'] = parse_output_words_response(old_data['outputWords'], old_data['words'],
                                                                        response, old_data['errors'])
         new_data['errors'] = old_data['errors']
+        record_parse_errors(request, old_data, previous_errors)
         new_data['attempt'] = new_data['attempt'] + 1
 
         if new_data['outputText'] != "" and sorted(previous_errors) == sorted(new_data['errors']):
@@ -1082,6 +1768,7 @@ async def vocabluary_generate(data: VocabluaryGenerator, request: Request):
         return VocabluaryGenerator(**old_data)
 
 @app.post("/admin/vocabluary-guide-generate")
+@persist_generation("translate")
 async def vocabluary_guide_generate(data: VocabluaryGuideGenerator, request: Request):
     old_data = copy.deepcopy(data.dict())
 
@@ -1105,6 +1792,7 @@ async def vocabluary_guide_generate(data: VocabluaryGuideGenerator, request: Req
         previous_errors = copy.deepcopy(old_data['errors'])
         new_data['translate'] = parse_translate_response(old_data['translate'], response, old_data['errors'])
         new_data['errors'] = old_data['errors']
+        record_parse_errors(request, old_data, previous_errors)
         new_data['attempt'] = new_data['attempt'] + 1
 
         if new_data['translate'] != "" and sorted(previous_errors) == sorted(new_data['errors']):
@@ -1118,6 +1806,7 @@ async def vocabluary_guide_generate(data: VocabluaryGuideGenerator, request: Req
         return VocabluaryGuideGenerator(**old_data)
 
 @app.post("/admin/interactive-task-generate")
+@persist_generation("text", "translate", "outputWords")
 async def interactive_task_generate(data: InteractiveTaskGenerator, request: Request):
     old_data = copy.deepcopy(data.dict())
 
@@ -1148,6 +1837,7 @@ async def interactive_task_generate(data: InteractiveTaskGenerator, request: Req
         new_data['translate'] = parse_interactive_task_translate_response(old_data['translate'], response, old_data['errors'])
         new_data['outputWords'] = parse_output_words_response(old_data['outputWords'], old_data['words'], response, old_data['errors'], False)
         new_data['errors'] = old_data['errors']
+        record_parse_errors(request, old_data, previous_errors)
         new_data['attempt'] = new_data['attempt'] + 1
 
         if new_data['text'] != "" and new_data['translate'] != "" and sorted(previous_errors) == sorted(new_data['errors']):
@@ -1161,6 +1851,7 @@ async def interactive_task_generate(data: InteractiveTaskGenerator, request: Req
         return InteractiveTaskGenerator(**old_data)
 
 @app.post("/admin/options-generate")
+@persist_generation("options", "correctOptionIndex")
 async def options_generate(data: OptionsGenerator, request: Request):
     old_data = copy.deepcopy(data.dict())
 
@@ -1186,6 +1877,7 @@ async def options_generate(data: OptionsGenerator, request: Request):
 
         new_data['options'] = result['options']
         new_data['correctOptionIndex'] = new_data['randomOption'] - 1
+        record_parse_errors(request, old_data, previous_errors)
         new_data['attempt'] = new_data['attempt'] + 1
 
         if sorted(old_data['options']) == sorted(new_data['options']):
@@ -1199,6 +1891,7 @@ async def options_generate(data: OptionsGenerator, request: Request):
         return OptionsGenerator(**old_data)
 
 @app.post("/admin/problems-generate")
+@persist_generation("outputSubtopics", "explanation")
 async def problems_generate(data: ProblemsGenerator, request: Request):
     old_data = copy.deepcopy(data.dict())
 
@@ -1254,6 +1947,7 @@ async def problems_generate(data: ProblemsGenerator, request: Request):
             )
 
         new_data['errors'] = old_data['errors']
+        record_parse_errors(request, old_data, previous_errors)
         new_data['attempt'] = new_data['attempt'] + 1
 
         if len(new_data['outputSubtopics']) != 0 and sorted(previous_errors) == sorted(new_data['errors']):
@@ -1322,7 +2016,9 @@ async def chat_generate(data: ChatGenerator, request: Request):
                 response = strip_chat_tags(response)
                 response = ensure_chat_tags(response)
 
+        errors_before_parse = copy.deepcopy(old_data['errors'])
         parsed_chat = parse_chat_response(old_data['chat'], response, old_data['errors'])
+        record_parse_errors(request, old_data, errors_before_parse)
         new_data = copy.deepcopy(old_data)
         previous_errors = copy.deepcopy(old_data['errors'])
 
@@ -1372,7 +2068,9 @@ async def chat_theory_generate(data: ChatTheoryGenerator, request: Request):
                 response = strip_chat_tags(response)
                 response = ensure_chat_tags(response)
 
+        errors_before_parse = copy.deepcopy(old_data['errors'])
         parsed_chat = parse_chat_response(old_data['chat'], response, old_data['errors'])
+        record_parse_errors(request, old_data, errors_before_parse)
         new_data = copy.deepcopy(old_data)
         previous_errors = copy.deepcopy(old_data['errors'])
 
@@ -1391,6 +2089,7 @@ async def chat_theory_generate(data: ChatTheoryGenerator, request: Request):
         return ChatTheoryGenerator(**old_data)
 
 @app.post("/admin/literature-generate")
+@persist_generation("note")
 async def literature_generate(data: LiteratureGenerator, request: Request):
     old_data = copy.deepcopy(data.dict())
 
@@ -1413,6 +2112,7 @@ async def literature_generate(data: LiteratureGenerator, request: Request):
         new_data['note'] = parse_literature_response(old_data['note'], response, old_data['errors'])
 
         new_data['errors'] = old_data['errors']
+        record_parse_errors(request, old_data, previous_errors)
         new_data['attempt'] = new_data['attempt'] + 1
 
         if new_data['note'] != "" and sorted(previous_errors) == sorted(new_data['errors']):
@@ -1426,6 +2126,7 @@ async def literature_generate(data: LiteratureGenerator, request: Request):
         return LiteratureGenerator(**old_data)
 
 @app.post("/admin/words-generate")
+@persist_generation("words")
 async def words_generate(data: WordsGenerator, request: Request):
     old_data = copy.deepcopy(data.dict())
 
@@ -1437,18 +2138,160 @@ async def words_generate(data: WordsGenerator, request: Request):
         from ai_generator import parse_words_response
 
         response = await request_ai(old_data['prompt'], old_data, request, stream=False, model="deepseek-chat")
+        previous_errors = copy.deepcopy(old_data['errors'])
         new_words = parse_words_response([], response, old_data['errors'])
+        record_parse_errors(request, old_data, previous_errors)
 
         new_data = copy.deepcopy(old_data)
         new_data['words'] = new_words
         new_data['changed'] = "false"
         return WordsGenerator(**new_data)
+    except (AdmissionRejected, AIDeadlineExceeded):
+        raise
     except Exception as e:
         old_data['errors'].append(str(e))
         old_data['changed'] = 'true'
         old_data['attempt'] += 1
         return WordsGenerator(**old_data)
 
+GENERATE_ENDPOINTS = {
+    "/admin/subtopics-generate": (subtopics_generate, SubtopicsGenerator),
+    "/admin/subtopics-status-generate": (subtopics_status_generate, SubtopicsStatusGenerator),
+    "/admin/topic-expansion-generate": (topic_expansion_generate, TopicExpansionGenerator),
+    "/admin/solution-generate": (solution_generate, SolutionGenerator),
+    "/admin/chronology-generate": (chronology_generate, ChronologyGenerator),
+    "/admin/frequency-generate": (frequency_generate, FrequencyGenerator),
+    "/admin/task-generate": (task_generate, TaskGenerator),
+    "/admin/exam-generate": (exam_generate, ExamGenerator),
+    "/admin/writing-generate": (writing_generate, WritingGenerator),
+    "/admin/vocabluary-generate": (vocabluary_generate, VocabluaryGenerator),
+    "/admin/vocabluary-guide-generate": (vocabluary_guide_generate, VocabluaryGuideGenerator),
+    "/admin/interactive-task-generate": (interactive_task_generate, InteractiveTaskGenerator),
+    "/admin/options-generate": (options_generate, OptionsGenerator),
+    "/admin/problems-generate": (problems_generate, ProblemsGenerator),
+    "/admin/chat-generate": (chat_generate, ChatGenerator),
+    "/admin/chat-theory-generate": (chat_theory_generate, ChatTheoryGenerator),
+    "/admin/literature-generate": (literature_generate, LiteratureGenerator),
+    "/admin/words-generate": (words_generate, WordsGenerator),
+}
+
+AI_CONVERGE_MAX_ROUNDS = int(os.getenv("AI_CONVERGE_MAX_ROUNDS", MAX_ATTEMPTS + 1))
+
+async def converge_generate(handler, data: BaseModel, request: Request):
+    result = data
+    rounds = 0
+    for rounds in range(1, AI_CONVERGE_MAX_ROUNDS + 1):
+        result = await handler(result, request)
+        if result.changed == "false" or result.attempt > MAX_ATTEMPTS:
+            break
+
+    logger.info(f"Converged after {rounds} round(s): changed={result.changed}, attempt={result.attempt}")
+    return result, rounds
+
+def register_sse_endpoint(path: str, handler, model_cls):
+    async def stream_endpoint(data: model_cls, request: Request):
+        return sse_generate(handler, data, request)
+
+    stream_endpoint.__name__ = f"{handler.__name__}_stream"
+    app.post(f"{path}/stream")(stream_endpoint)
+
+def register_converge_endpoint(path: str, handler, model_cls):
+    async def converge_endpoint(data: model_cls, request: Request, response: Response):
+        result, rounds = await converge_generate(handler, data, request)
+        response.headers["X-Converge-Rounds"] = str(rounds)
+        return result
+
+    converge_endpoint.__name__ = f"{handler.__name__}_converge"
+    app.post(f"{path}/converge")(converge_endpoint)
+
+for sse_path, (sse_handler, sse_model) in GENERATE_ENDPOINTS.items():
+    register_sse_endpoint(sse_path, sse_handler, sse_model)
+    register_converge_endpoint(sse_path, sse_handler, sse_model)
+
+AI_BATCH_MAX_ITEMS = int(os.getenv("AI_BATCH_MAX_ITEMS", 200))
+AI_BATCH_MAX_CONCURRENCY = int(os.getenv("AI_BATCH_MAX_CONCURRENCY", 8))
+
+class BatchGenerateItem(BaseModel):
+    id: Optional[str] = None
+    endpoint: str
+    data: Dict[str, Any]
+    converge: bool = False
+
+class BatchGenerateRequest(BaseModel):
+    items: List[BatchGenerateItem]
+    concurrency: int = 4
+
+def make_item_request(request: Request, path: str) -> Request:
+    scope = dict(request.scope)
+    scope["path"] = path
+    scope["raw_path"] = path.encode("utf-8")
+    scope["state"] = {}
+    return Request(scope, request.receive)
+
+@app.post("/admin/batch-generate")
+async def batch_generate(data: BatchGenerateRequest, request: Request):
+    if not data.items:
+        raise HTTPException(status_code=400, detail="Brak elementów do wygenerowania")
+    if len(data.items) > AI_BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"Za dużo elementów (max {AI_BATCH_MAX_ITEMS})")
+
+    concurrency = max(1, min(data.concurrency, AI_BATCH_MAX_CONCURRENCY))
+    semaphore = asyncio.Semaphore(concurrency)
+    results = asyncio.Queue()
+    started = time.monotonic()
+
+    async def run_item(index: int, item: BatchGenerateItem):
+        path = item.endpoint if item.endpoint.startswith("/") else f"/admin/{item.endpoint}"
+        payload = {"index": index, "id": item.id, "endpoint": path}
+        try:
+            if path not in GENERATE_ENDPOINTS:
+                raise HTTPException(status_code=404, detail=f"Nieznany endpoint: {path}")
+
+            handler, model_cls = GENERATE_ENDPOINTS[path]
+            item_data = model_cls(**item.data)
+
+            async with semaphore:
+                item_request = make_item_request(request, path)
+                if item.converge:
+                    result, rounds = await converge_generate(handler, item_data, item_request)
+                    payload["rounds"] = rounds
+                else:
+                    result = await handler(item_data, item_request)
+
+            payload.update({"status_code": 200, "result": jsonable_encoder(result)})
+        except Exception as e:
+            payload.update(ai_error_payload(e))
+        results.put_nowait(payload)
+
+    tasks = [asyncio.create_task(run_item(index, item)) for index, item in enumerate(data.items)]
+
+    async def events():
+        succeeded = 0
+        try:
+            for _ in range(len(tasks)):
+                payload = await results.get()
+                if payload["status_code"] == 200:
+                    succeeded += 1
+                yield format_sse("item", payload)
+
+            yield format_sse("done", {
+                "total": len(tasks),
+                "succeeded": succeeded,
+                "failed": len(tasks) - succeeded,
+                "concurrency": concurrency,
+                "elapsed_seconds": round(time.monotonic() - started, 3)
+            })
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 #if __name__ == "__main__":
 #     import uvicorn
 #
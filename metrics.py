@@ -0,0 +1,137 @@
+import bisect
+import threading
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+LabelValues = Tuple[str, ...]
+
+LATENCY_BUCKETS = (0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300, 600)
+TOKEN_BUCKETS = (100, 250, 500, 1000, 2000, 4000, 8000, 16000, 32000)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: LabelValues, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class Counter:
+    """Монотонный счётчик с метками"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values: str, amount: float = 1):
+        if amount <= 0:
+            return
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def samples(self) -> Iterable[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        for values, value in items:
+            yield f"{self.name}{_format_labels(self.labels, values)} {_format_number(value)}"
+
+
+class Histogram:
+    """Гистограмма с кумулятивными бакетами в формате Prometheus"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self._values: Dict[LabelValues, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, *label_values: str, value: float):
+        with self._lock:
+            # [счётчики по бакетам..., +Inf, sum]
+            state = self._values.get(label_values)
+            if state is None:
+                state = self._values[label_values] = [0] * (len(self.buckets) + 1) + [0.0]
+            state[bisect.bisect_left(self.buckets, value)] += 1
+            state[-1] += value
+
+    def samples(self) -> Iterable[str]:
+        with self._lock:
+            items = sorted((values, list(state)) for values, state in self._values.items())
+        for values, state in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), state[:-1]):
+                cumulative += count
+                le = f'le="{_format_number(bound)}"'
+                yield f"{self.name}_bucket{_format_labels(self.labels, values, le)} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labels, values)} {_format_number(round(state[-1], 6))}"
+            yield f"{self.name}_count{_format_labels(self.labels, values)} {cumulative}"
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = []
+
+    def counter(self, name: str, help_text: str, labels: Sequence[str] = ()) -> Counter:
+        metric = Counter(name, help_text, labels)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, help_text: str, labels: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        metric = Histogram(name, help_text, labels, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """Текстовый формат экспозиции Prometheus 0.0.4"""
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.help_text}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+LABELS = ("endpoint", "model")
+
+ai_attempts = registry.counter(
+    "ai_attempts_total", "Upstream AI attempts by outcome", LABELS + ("outcome",))
+ai_retries = registry.counter(
+    "ai_retries_total", "Upstream AI attempts that were retried", LABELS)
+ai_prompt_tokens = registry.counter(
+    "ai_prompt_tokens_total", "Prompt tokens reported by the API", LABELS)
+ai_completion_tokens = registry.counter(
+    "ai_completion_tokens_total", "Completion tokens reported by the API", LABELS)
+ai_cached_tokens = registry.counter(
+    "ai_cached_tokens_total", "Prompt tokens served from the provider prefix cache", LABELS)
+ai_cache_hits = registry.counter(
+    "ai_response_cache_hits_total", "Responses served from the local response cache", LABELS)
+ai_parse_failures = registry.counter(
+    "ai_parse_failures_total", "Generator rounds whose response added new parse/validation errors", LABELS)
+ai_latency = registry.histogram(
+    "ai_upstream_latency_seconds", "Latency of a single upstream AI attempt", LABELS)
+ai_ttft = registry.histogram(
+    "ai_time_to_first_token_seconds", "Time to the first streamed token", LABELS)
+ai_completion_tokens_per_call = registry.histogram(
+    "ai_completion_tokens", "Completion tokens per successful call", LABELS, TOKEN_BUCKETS)
@@ -0,0 +1,110 @@
+import json
+import re
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Tuple
+
+SLOT_PATTERN = re.compile(r"\{#(\w+)#\}|\{\$(\w+)\$\}")
+
+
+def render_json_value(key: str, data: Dict[str, Any]) -> str:
+    return json.dumps(data.get(key, {}), ensure_ascii=False)
+
+
+def render_text_value(key: str, data: Dict[str, Any]) -> str:
+    value = data.get(key, "")
+
+    if isinstance(value, list):
+        if not value:
+            return f"{key}Start:\n{value}\n{key}End:"
+        lines = []
+        for item in value:
+            if isinstance(item, list):
+                lines.append(";".join(str(subitem) for subitem in item))
+            else:
+                lines.append(str(item))
+        return f"{key}Start:\n" + "\n".join(lines) + f"\n{key}End:"
+    return str(value)
+
+
+def render_block(key: str, as_json: bool, data: Dict[str, Any]) -> str:
+    if as_json:
+        return f"{key}Start:\n{render_json_value(key, data)}\n{key}End:"
+    if isinstance(data.get(key, ""), list):
+        return render_text_value(key, data)
+    return f"{key}Start:\n{render_text_value(key, data)}\n{key}End:"
+
+
+class CompiledPrompt:
+    """Шаблон промпта, разобранный один раз: литералы и слоты (ключ, json или текст)"""
+
+    __slots__ = ("literals", "slots")
+
+    def __init__(self, template: str):
+        self.literals: List[str] = []
+        self.slots: List[Tuple[str, bool]] = []
+
+        position = 0
+        for match in SLOT_PATTERN.finditer(template):
+            self.literals.append(template[position:match.start()])
+            json_key, text_key = match.groups()
+            self.slots.append((json_key, True) if json_key else (text_key, False))
+            position = match.end()
+        self.literals.append(template[position:])
+
+    def render(self, data: Dict[str, Any]) -> str:
+        """Подставляет все слоты на свои места"""
+        rendered: Dict[Tuple[str, bool], str] = {}
+        parts = [self.literals[0]]
+        for slot, literal in zip(self.slots, self.literals[1:]):
+            value = rendered.get(slot)
+            if value is None:
+                value = rendered[slot] = self._render_slot(slot, data)
+            parts.append(value)
+            parts.append(literal)
+        return "".join(parts)
+
+    def render_stable(self, data: Dict[str, Any], volatile: Iterable[str]) -> Tuple[str, int]:
+        """
+        Изменчивые слоты заменяются ссылкой и выносятся в конец промпта.
+        Возвращает текст и длину стабильного префикса.
+        """
+        volatile = set(volatile)
+        rendered: Dict[Tuple[str, bool], str] = {}
+        volatile_slots: List[Tuple[str, bool]] = []
+        parts = [self.literals[0]]
+
+        for slot, literal in zip(self.slots, self.literals[1:]):
+            key = slot[0]
+            if key in volatile:
+                if slot not in volatile_slots:
+                    volatile_slots.append(slot)
+                parts.append(f"[{key} - patrz koniec promptu]")
+            else:
+                value = rendered.get(slot)
+                if value is None:
+                    value = rendered[slot] = self._render_slot(slot, data)
+                parts.append(value)
+            parts.append(literal)
+
+        static_prompt = "".join(parts)
+        if not volatile_slots:
+            return static_prompt, len(static_prompt)
+
+        volatile_tail = "\n\n".join(render_block(key, as_json, data) for key, as_json in volatile_slots)
+        return f"{static_prompt}\n\n{volatile_tail}", len(static_prompt)
+
+    @staticmethod
+    def _render_slot(slot: Tuple[str, bool], data: Dict[str, Any]) -> str:
+        key, as_json = slot
+        if as_json:
+            return render_json_value(key, data)
+        return render_text_value(key, data)
+
+
+@lru_cache(maxsize=512)
+def compile_prompt(template: str) -> CompiledPrompt:
+    return CompiledPrompt(template)
+
+
+def fill_placeholders(prompt: str, data: Dict[str, Any]) -> str:
+    return compile_prompt(prompt).render(data)
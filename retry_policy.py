@@ -0,0 +1,166 @@
+import asyncio
+import random
+import time
+from dataclasses import dataclass, replace
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from typing import List, Optional
+
+import httpx
+import openai
+
+RATE_LIMIT = "rate_limit"
+TIMEOUT = "timeout"
+SERVER_ERROR = "server_error"
+CONNECTION_ERROR = "connection_error"
+CLIENT_ERROR = "client_error"
+INVALID_RESPONSE = "invalid_response"
+FORMAT_VIOLATION = "format_violation"
+TRUNCATED = "truncated"
+UNKNOWN = "unknown"
+
+RETRYABLE_KINDS = {
+    RATE_LIMIT, TIMEOUT, SERVER_ERROR, CONNECTION_ERROR, INVALID_RESPONSE, FORMAT_VIOLATION, TRUNCATED, UNKNOWN
+}
+
+# Попытку оборвал сам клиент (валидатор стрима, собственный потолок max_tokens), а не сервер - ждать нечего
+IMMEDIATE_KINDS = {FORMAT_VIOLATION, TRUNCATED}
+
+
+def classify_error(error: Optional[BaseException]) -> str:
+    """Определяет класс ошибки: от него зависит, есть ли смысл повторять запрос"""
+    if error is None:
+        return INVALID_RESPONSE
+    if isinstance(error, AIFormatViolation):
+        return FORMAT_VIOLATION
+    if isinstance(error, AIOutputTruncated):
+        return TRUNCATED
+    if isinstance(error, openai.RateLimitError):
+        return RATE_LIMIT
+    if isinstance(error, (openai.APITimeoutError, asyncio.TimeoutError, httpx.TimeoutException)):
+        return TIMEOUT
+    if isinstance(error, (openai.APIConnectionError, httpx.TransportError)):
+        return CONNECTION_ERROR
+    if isinstance(error, openai.APIStatusError):
+        if error.status_code == 429:
+            return RATE_LIMIT
+        if error.status_code in (408, 409):
+            return TIMEOUT
+        if error.status_code >= 500:
+            return SERVER_ERROR
+        return CLIENT_ERROR
+    return UNKNOWN
+
+
+def get_retry_after(error: Optional[BaseException]) -> Optional[float]:
+    """Задержка, которую сервер попросил через Retry-After / retry-after-ms"""
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+
+    headers = response.headers
+    retry_after_ms = headers.get("retry-after-ms")
+    if retry_after_ms:
+        try:
+            return max(0.0, float(retry_after_ms) / 1000)
+        except ValueError:
+            pass
+
+    retry_after = headers.get("retry-after")
+    if not retry_after:
+        return None
+    try:
+        return max(0.0, float(retry_after))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(retry_after)
+        return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """Экспоненциальный backoff с полным джиттером и общим бюджетом времени на все попытки"""
+
+    max_retries: int = 1
+    base_delay: float = 1.0
+    max_delay: float = 30.0
+    total_budget: float = 1800.0
+
+    def with_retries(self, max_retries: int) -> "RetryPolicy":
+        return replace(self, max_retries=max_retries)
+
+    def backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    def start(self, deadline: Optional[float] = None) -> "RetryState":
+        limit = time.monotonic() + self.total_budget
+        return RetryState(self, limit if deadline is None else min(limit, deadline), limit)
+
+
+class RetryState:
+    """Состояние повторов одного вызова"""
+
+    def __init__(self, policy: RetryPolicy, deadline: float, limit: Optional[float] = None):
+        self.policy = policy
+        self.deadline = deadline
+        self.limit = deadline if limit is None else limit
+        self.last_kind: Optional[str] = None
+
+    def extend(self, deadline: Optional[float]):
+        """Сдвигает дедлайн позже (к вызову присоединился запрос с большим запасом), но не дальше бюджета"""
+        self.deadline = max(self.deadline, self.limit if deadline is None else min(self.limit, deadline))
+
+    def remaining(self) -> float:
+        return max(0.0, self.deadline - time.monotonic())
+
+    def next_delay(self, attempt: int, error: Optional[BaseException] = None) -> Optional[float]:
+        """Пауза перед следующей попыткой или None, если повторять не нужно"""
+        self.last_kind = classify_error(error)
+        if self.last_kind not in RETRYABLE_KINDS:
+            return None
+        if attempt >= self.policy.max_retries:
+            return None
+
+        if self.last_kind in IMMEDIATE_KINDS:
+            return 0.0 if self.remaining() > 0 else None
+
+        delay = get_retry_after(error)
+        if delay is None:
+            delay = self.policy.backoff(attempt)
+
+        # Если после паузы бюджета не останется - нет смысла ждать
+        if delay >= self.remaining():
+            return None
+        return delay
+
+
+class AIDeadlineExceeded(Exception):
+    """Бюджет времени запроса исчерпан до получения ответа"""
+
+    def __init__(self, endpoint: str, budget: float):
+        super().__init__(f"{endpoint}: deadline of {budget:.1f}s exceeded")
+        self.endpoint = endpoint
+        self.budget = budget
+
+
+class AIFormatViolation(Exception):
+    """Ответ нарушил формат эндпоинта ещё во время стриминга; попытка оборвана"""
+
+    def __init__(self, endpoint: str, errors: List[str], partial: str):
+        super().__init__(f"{endpoint}: format violation: {'; '.join(errors)}")
+        self.endpoint = endpoint
+        self.errors = errors
+        self.partial = partial
+
+
+class AIOutputTruncated(Exception):
+    """Ответ упёрся в подобранный по истории потолок max_tokens"""
+
+    def __init__(self, endpoint: str, max_tokens: int, partial: str):
+        super().__init__(f"{endpoint}: output truncated at max_tokens={max_tokens}")
+        self.endpoint = endpoint
+        self.max_tokens = max_tokens
+        self.partial = partial
@@ -0,0 +1,237 @@
+# segmentation.py
+import re
+import threading
+from typing import Callable, Dict, Iterable, List, Optional
+import logging
+
+logger = logging.getLogger("app_logger")
+
+SPACY_MODELS = {
+    "pl": "pl_core_news_sm",
+    "ru": "ru_core_news_sm",
+    "en": "en_core_web_sm",
+}
+
+COMMON_ABBREVIATIONS = {
+    "pl": [
+        "np.", "itp.", "tj.", "dr.", "mgr.", "prof.", "ul.", "al.", "św.",
+        "r.", "god.", "p.", "nr.", "ok.", "m.in.", "cdn.", "tzn."
+    ],
+    "en": [
+        "mr.", "mrs.", "ms.", "dr.", "prof.", "inc.", "ltd.", "jr.", "sr.",
+        "st.", "vs.", "u.s.", "u.k.", "e.g.", "i.e.", "etc.", "fig."
+    ],
+    "ru": [
+        "т.е.", "т.д.", "т.п.", "т.к.", "т.н.", "др.", "пр.", "см.", "ср.", "напр.", "г.", "гг.",
+        "в.", "вв.", "им.", "ул.", "д.", "стр.", "проф.", "акад.", "тыс.", "млн.", "млрд.",
+        "руб.", "коп.", "н.э.", "и.о.", "рис.", "табл."
+    ],
+}
+
+SENTENCE_END = r"[.!?…]"
+SENTENCE_START = r"(?=[\"“”'«»„\(]*[A-ZА-ЯŁŚŹŻĆŃ])"
+
+
+class AbbreviationSegmenter:
+    """Regex-сегментатор с заранее скомпилированным списком сокращений одного языка.
+
+    Текст режется одним проходом re.split: граница - пробел после [.!?…] перед заглавной буквой,
+    если точка не завершает сокращение. Сокращения проверяются lookbehind-ами, сгруппированными
+    по длине, поэтому они вычисляются только в точках-кандидатах, а не на каждой позиции текста."""
+
+    def __init__(self, abbreviations: Iterable[str]):
+        self.abbreviations = sorted({a.strip().lower() for a in abbreviations if a.strip()})
+
+        by_length: Dict[int, List[str]] = {}
+        for abbreviation in self.abbreviations:
+            by_length.setdefault(len(abbreviation), []).append(re.escape(abbreviation))
+
+        # Без учёта регистра сравниваются только сокращения: SENTENCE_START требует именно заглавную букву
+        not_abbreviation = "".join(
+            rf"(?<!\b(?i:{'|'.join(items)}))" for _, items in sorted(by_length.items())
+        )
+        self._pattern = re.compile(rf"(?<={SENTENCE_END}){not_abbreviation}\s+{SENTENCE_START}")
+
+    def split(self, text: str) -> List[str]:
+        if not text or not isinstance(text, str):
+            return []
+
+        parts = self._pattern.split(text)
+
+        sentences = []
+        for part in parts:
+            sentence = part.strip()
+            if not sentence:
+                continue
+            # Обрывки короче 3 символов и продолжения со строчной буквы приклеиваем к предыдущему
+            if sentences and (len(sentence) < 3 or sentence[0].islower()):
+                sentences[-1] += " " + sentence
+            else:
+                sentences.append(sentence)
+
+        return sentences
+
+
+class AbbreviationRegistry:
+    """Сегментаторы по языкам: компилируются при первом обращении и пересобираются при смене списка"""
+
+    def __init__(self, abbreviations: Dict[str, List[str]]):
+        self._abbreviations = {language: list(items) for language, items in abbreviations.items()}
+        self._custom: Dict[str, List[str]] = {}
+        self._segmenters: Dict[str, AbbreviationSegmenter] = {}
+        self._lock = threading.Lock()
+
+    def get(self, language: str) -> AbbreviationSegmenter:
+        language = (language or "en").lower()
+        segmenter = self._segmenters.get(language)
+        if segmenter is None:
+            with self._lock:
+                segmenter = self._segmenters.get(language)
+                if segmenter is None:
+                    segmenter = AbbreviationSegmenter(self.abbreviations(language))
+                    self._segmenters[language] = segmenter
+        return segmenter
+
+    def abbreviations(self, language: str) -> List[str]:
+        language = language.lower()
+        return self._abbreviations.get(language, []) + self._custom.get(language, [])
+
+    def set_custom(self, language: str, abbreviations: List[str], replace: bool = False):
+        """Добавляет (или заменяет) пользовательские сокращения языка"""
+        language = language.lower()
+        with self._lock:
+            current = [] if replace else self._custom.get(language, [])
+            self._custom[language] = current + [a for a in abbreviations if a not in current]
+            self._segmenters.pop(language, None)
+
+    def custom_for(self, language: str) -> List[str]:
+        """Пользовательские сокращения языка - встроенные spaCy-модели и так знают"""
+        return list(self._custom.get(language.lower(), []))
+
+    def custom(self) -> Dict[str, List[str]]:
+        return {language: list(items) for language, items in self._custom.items()}
+
+
+abbreviation_registry = AbbreviationRegistry(COMMON_ABBREVIATIONS)
+
+
+ABBREVIATION_COMPONENT = "abbreviation_boundaries"
+
+
+class AbbreviationBoundaries:
+    """spaCy-компонент после senter: запрещает начало предложения сразу после сокращения из списка"""
+
+    def __init__(self, abbreviations: Iterable[str]):
+        self.abbreviations = {a.lower() for a in abbreviations}
+
+    def __call__(self, doc):
+        for token in doc[:-1]:
+            if token.lower_ in self.abbreviations:
+                doc[token.i + 1].is_sent_start = False
+        return doc
+
+
+def _register_abbreviation_component():
+    from spacy.language import Language
+
+    if Language.has_factory(ABBREVIATION_COMPONENT):
+        return
+
+    @Language.factory(ABBREVIATION_COMPONENT, default_config={"abbreviations": []})
+    def create_abbreviation_boundaries(nlp, name: str, abbreviations: List[str]):
+        return AbbreviationBoundaries(abbreviations)
+
+
+class SentenceSegmenter:
+    """Сегментация текстов на предложения через spaCy; модели грузятся лениво, один раз на процесс"""
+
+    def __init__(self, models: Dict[str, str], batch_size: int = 64,
+                 fallback: Optional[Callable[[str, str], List[str]]] = None,
+                 abbreviations: Optional[Callable[[str], List[str]]] = None):
+        self.models = models
+        self.batch_size = batch_size
+        self.fallback = fallback
+        self.abbreviations = abbreviations
+        self._pipelines: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def _load(self, language: str):
+        if language in self._pipelines:
+            return self._pipelines[language]
+
+        with self._lock:
+            if language in self._pipelines:
+                return self._pipelines[language]
+            self._pipelines[language] = self._build(language)
+            return self._pipelines[language]
+
+    def _build(self, language: str):
+        try:
+            import spacy
+        except ImportError:
+            logger.warning("spaCy is not installed, falling back to regex sentence splitting")
+            return None
+
+        model = self.models.get(language)
+        if not model:
+            return None
+
+        try:
+            nlp = spacy.load(model)
+        except OSError:
+            # Пустой пайплайн с голым sentencizer режет по "np." и "dr." - regex со списком сокращений точнее
+            logger.warning(f"spaCy model {model} is not installed, falling back to regex sentence splitting")
+            return None
+
+        # Оставляем только statistical senter - parser, NER и теггеры для границ предложений не нужны
+        keep = {"senter"} if "senter" in nlp.component_names else set()
+        for name in nlp.component_names:
+            if name not in keep:
+                nlp.disable_pipe(name)
+        if keep:
+            nlp.enable_pipe("senter")
+        else:
+            nlp.add_pipe("sentencizer")
+
+        abbreviations = self.abbreviations(language) if self.abbreviations else []
+        if abbreviations:
+            # Сокращение - один токен, иначе токенизатор отрезает точку и senter видит в ней конец предложения
+            for abbreviation in abbreviations:
+                for variant in {abbreviation, abbreviation.capitalize(), abbreviation.upper()}:
+                    nlp.tokenizer.add_special_case(variant, [{"ORTH": variant}])
+            _register_abbreviation_component()
+            nlp.add_pipe(ABBREVIATION_COMPONENT, config={"abbreviations": abbreviations}, last=True)
+
+        logger.info(f"✅ Sentence segmenter loaded [{language}]: {nlp.pipe_names}")
+        return nlp
+
+    def invalidate(self, language: str):
+        """Пайплайн языка пересоберётся при следующем обращении - со свежим списком сокращений"""
+        with self._lock:
+            self._pipelines.pop(language.lower(), None)
+
+    def split_many(self, texts: List[str], language: str = "en") -> List[List[str]]:
+        """Делит список текстов на предложения одним проходом nlp.pipe"""
+        language = (language or "en").lower()
+        nlp = self._load(language)
+
+        if nlp is None:
+            split = self.fallback or (lambda text, _: [text.strip()] if text and text.strip() else [])
+            return [split(text, language) for text in texts]
+
+        results: List[List[str]] = [[] for _ in texts]
+        indexed = [(i, text) for i, text in enumerate(texts) if text and isinstance(text, str) and text.strip()]
+
+        docs = nlp.pipe((text for _, text in indexed), batch_size=self.batch_size)
+        for (i, _), doc in zip(indexed, docs):
+            results[i] = [sent.text.strip() for sent in doc.sents if sent.text.strip()]
+        return results
+
+    def split(self, text: str, language: str = "en") -> List[str]:
+        return self.split_many([text], language)[0]
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            language: (nlp.pipe_names if nlp is not None else None)
+            for language, nlp in self._pipelines.items()
+        }
@@ -0,0 +1,119 @@
+import asyncio
+import contextlib
+import contextvars
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger("app_logger")
+
+
+class TokenFanout:
+    """Раздаёт события общего вызова всем ожидающим; присоединившийся позже сначала получает уже отправленные"""
+
+    def __init__(self):
+        self.events: List[Any] = []
+        self._sinks: List[asyncio.Queue] = []
+
+    def attach(self, sink: asyncio.Queue):
+        for event in self.events:
+            sink.put_nowait(event)
+        self._sinks.append(sink)
+
+    def detach(self, sink: asyncio.Queue):
+        if sink in self._sinks:
+            self._sinks.remove(sink)
+
+    def put_nowait(self, event: Any):
+        self.events.append(event)
+        for sink in self._sinks:
+            sink.put_nowait(event)
+
+
+class Flight:
+    """Общий вызов: самый поздний дедлайн из ожидающих и раздача его событий"""
+
+    def __init__(self, deadline: Optional[float]):
+        self.task: Optional[asyncio.Task] = None
+        self.waiters = 0
+        self.deadline = deadline
+        self.tokens = TokenFanout()
+        self._timers: Dict[asyncio.Timeout, float] = {}
+
+    def extend(self, deadline: Optional[float]):
+        if self.deadline is None or deadline is None:
+            self.deadline = None
+        else:
+            self.deadline = max(self.deadline, deadline)
+
+        for timer, limit in self._timers.items():
+            timer.reschedule(self._when(limit))
+
+    @contextlib.asynccontextmanager
+    async def timeout(self, seconds: float):
+        """asyncio.timeout попытки: не дольше seconds и не позже дедлайна, который сдвигают присоединившиеся"""
+        limit = time.monotonic() + seconds
+        async with asyncio.timeout_at(self._when(limit)) as timer:
+            self._timers[timer] = limit
+            try:
+                yield timer
+            finally:
+                del self._timers[timer]
+
+    def _when(self, limit: float) -> float:
+        # loop.time() в asyncio - это time.monotonic(), поэтому дедлайны сравниваются напрямую
+        return limit if self.deadline is None else min(limit, self.deadline)
+
+
+class SingleFlight:
+    """Объединяет одинаковые одновременные запросы: все ждут один вызов и получают общий результат"""
+
+    def __init__(self):
+        self._calls: Dict[str, Flight] = {}
+        self.leaders = 0
+        self.shared = 0
+
+    async def do(self, key: str, fn: Callable[[Flight], Awaitable[Any]], deadline: Optional[float] = None,
+                 sink: Optional[asyncio.Queue] = None) -> Tuple[Any, bool]:
+        """Возвращает (результат, shared); shared - результат получен чужим вызовом.
+
+        Ведущий и присоединившиеся определяются здесь же, до первого await, поэтому из двух
+        одновременных одинаковых запросов ведущим всегда оказывается ровно один. Вызов идёт
+        в пустом контексте: ContextVar-ы ведущего запроса он не видит, дедлайн берёт из Flight,
+        а события отдаёт в sink каждого ожидающего."""
+        call = self._calls.get(key)
+        shared = call is not None
+        if call is None:
+            call = Flight(deadline)
+            call.task = asyncio.create_task(fn(call), context=contextvars.Context())
+            self._calls[key] = call
+            call.task.add_done_callback(lambda _: self._forget(key, call))
+            self.leaders += 1
+        else:
+            call.extend(deadline)
+            self.shared += 1
+            logger.info(f"🔗 Joined in-flight request: {key[:8]}...")
+
+        call.waiters += 1
+        if sink is not None:
+            call.tokens.attach(sink)
+        try:
+            # shield: отмена одного ожидающего не должна отменять вызов для остальных
+            return await asyncio.shield(call.task), shared
+        finally:
+            call.waiters -= 1
+            if sink is not None:
+                call.tokens.detach(sink)
+            if call.waiters == 0 and not call.task.done():
+                call.task.cancel()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "in_flight": len(self._calls),
+            "leaders": self.leaders,
+            "shared": self.shared
+        }
+
+    def _forget(self, key: str, call: Flight):
+        if self._calls.get(key) is call:
+            del self._calls[key]
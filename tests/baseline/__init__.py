@@ -0,0 +1 @@
+# Замороженные копии реализаций до оптимизаций: эталон для тестов эквивалентности
@@ -0,0 +1,62 @@
+# fill_placeholders и assemble_prompt из main.py до компиляции шаблонов (user-015), без изменений логики
+import json
+import re
+from typing import Any, Dict, Iterable, Tuple
+
+
+def fill_placeholders(prompt: str, data: Dict[str, Any]) -> str:
+    def json_replacer(match: re.Match) -> str:
+        key = match.group(1)
+        value = data.get(key, {})
+        return json.dumps(value, ensure_ascii=False)
+
+    def replacer(match: re.Match) -> str:
+        key = match.group(1)
+        value = data.get(key, "")
+
+        if isinstance(value, list):
+            if not value:
+                return f"{key}Start:\n{value}\n{key}End:"
+            lines = []
+            for item in value:
+                if isinstance(item, list):
+                    lines.append(";".join(str(subitem) for subitem in item))
+                else:
+                    lines.append(str(item))
+            return f"{key}Start:\n" + "\n".join(lines) + f"\n{key}End:"
+        return str(value)
+
+    prompt = re.sub(r"\{#(\w+)#\}", json_replacer, prompt)
+    prompt = re.sub(r"\{\$(\w+)\$\}", replacer, prompt)
+
+    return prompt
+
+
+def render_volatile_block(key: str, as_json: bool, data: Dict[str, Any]) -> str:
+    value = data.get(key, {} if as_json else "")
+    if as_json:
+        return f"{key}Start:\n{json.dumps(value, ensure_ascii=False)}\n{key}End:"
+    if isinstance(value, list):
+        return fill_placeholders(f"{{${key}$}}", data)
+    return f"{key}Start:\n{value}\n{key}End:"
+
+
+def assemble_prompt(prompt: str, data: Dict[str, Any], volatile: Iterable[str]) -> Tuple[str, int]:
+    volatile = set(volatile)
+    volatile_slots = []
+
+    def volatile_replacer(match: re.Match) -> str:
+        key = match.group(2)
+        if key not in volatile:
+            return match.group(0)
+        slot = (key, match.group(1) == "#")
+        if slot not in volatile_slots:
+            volatile_slots.append(slot)
+        return f"[{key} - patrz koniec promptu]"
+
+    static_prompt = fill_placeholders(re.sub(r"\{([#$])(\w+)\1\}", volatile_replacer, prompt), data)
+    if not volatile_slots:
+        return static_prompt, len(static_prompt)
+
+    volatile_tail = "\n\n".join(render_volatile_block(key, as_json, data) for key, as_json in volatile_slots)
+    return f"{static_prompt}\n\n{volatile_tail}", len(static_prompt)
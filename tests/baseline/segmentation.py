@@ -0,0 +1,45 @@
+# split_text_into_sentences из main.py базовой версии, без изменений
+import re
+
+COMMON_ABBREVIATIONS = {
+    "pl": [
+        "np.", "itp.", "tj.", "dr.", "mgr.", "prof.", "ul.", "al.", "św.",
+        "r.", "god.", "p.", "nr.", "ok.", "m.in.", "cdn.", "tzn."
+    ],
+    "en": [
+        "mr.", "mrs.", "ms.", "dr.", "prof.", "inc.", "ltd.", "jr.", "sr.",
+        "st.", "vs.", "u.s.", "u.k.", "e.g.", "i.e.", "etc.", "fig."
+    ],
+}
+
+def split_text_into_sentences(text: str, language: str = "en") -> list[str]:
+    if not text or not isinstance(text, str):
+        return []
+
+    abbreviations = COMMON_ABBREVIATIONS.get(language.lower(), [])
+    abbrev_pattern = re.compile(
+        r"\b(" + "|".join([re.escape(a) for a in abbreviations]) + r")",
+        re.IGNORECASE
+    )
+
+    text_protected = abbrev_pattern.sub(lambda m: m.group(1).replace(".", "§"), text)
+
+    text_protected = re.sub(r"(\d)\.(\d)", r"\1§\2", text_protected)
+
+    parts = re.split(
+        r"(?<=[.!?…])\s+(?=[\"“”'«»„\(]*[A-ZА-ЯŁŚŹŻĆŃ])",
+        text_protected
+    )
+
+    sentences = []
+    for p in parts:
+        s = p.strip().replace("§", ".")
+        if s:
+            if sentences and (
+                len(s) < 3 or (s and s[0].islower())
+            ):
+                sentences[-1] += " " + s
+            else:
+                sentences.append(s)
+
+    return sentences
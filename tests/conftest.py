@@ -0,0 +1,44 @@
+import asyncio
+import json
+import os
+import sys
+
+import httpx
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DEEPSEEK_API_KEY", "test")
+
+
+@pytest.fixture
+def fake_ai(monkeypatch):
+    """Подменяет клиент DeepSeek: ответ text отдаётся кусками по 5 символов с паузой delay"""
+    import main
+    from openai import AsyncOpenAI
+
+    state = {"text": "Start:\nAlgebra;80\nEnd:", "delay": 0.0, "requests": []}
+
+    async def handler(request: httpx.Request):
+        body = json.loads(request.content)
+        state["requests"].append(body)
+        text = state["text"]
+        if body.get("stream"):
+            async def chunks():
+                for i in range(0, len(text), 5):
+                    await asyncio.sleep(state["delay"])
+                    chunk = {"id": "1", "object": "chat.completion.chunk", "created": 0, "model": body["model"],
+                             "choices": [{"index": 0, "delta": {"content": text[i:i + 5]}, "finish_reason": None}]}
+                    yield f"data: {json.dumps(chunk)}\n\n".encode()
+                yield b"data: [DONE]\n\n"
+            return httpx.Response(200, headers={"content-type": "text/event-stream"}, content=chunks())
+
+        await asyncio.sleep(state["delay"])
+        return httpx.Response(200, json={
+            "id": "1", "object": "chat.completion", "created": 0, "model": body["model"],
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15}
+        })
+
+    http_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(main, "client", AsyncOpenAI(api_key="test", http_client=http_client, max_retries=0))
+    return state
@@ -0,0 +1,30 @@
+from generation_store import GenerationStore, generation_key
+
+
+def make_store(tmp_path):
+    return GenerationStore(str(tmp_path / "generations.db"))
+
+
+def test_get_counts_hits(tmp_path):
+    store = make_store(tmp_path)
+    store.put("k", "/admin/subtopics-generate", "v1", {"subtopics": [["Algebra", 80]]})
+
+    assert store.get("k") == {"subtopics": [["Algebra", 80]]}
+    assert store.get("missing") is None
+    assert store.stats()["endpoints"]["/admin/subtopics-generate"]["hits"] == 1
+
+
+def test_get_many_does_not_count_hits(tmp_path):
+    store = make_store(tmp_path)
+    store.put("k", "/admin/subtopics-generate", "v1", {"subtopics": []})
+
+    assert store.get_many(["k", "missing"]) == {"k": {"subtopics": []}}
+    assert store.stats()["endpoints"]["/admin/subtopics-generate"]["hits"] == 0
+
+
+def test_generation_key_ignores_volatile_fields():
+    payload = {"topic": "t", "prompt": "P {$topic$}", "attempt": 0, "errors": [], "subtopics": []}
+    retry = {**payload, "attempt": 3, "errors": ["x"], "subtopics": [["Algebra", 80]]}
+
+    assert generation_key("/admin/subtopics-generate", payload, ("subtopics",)) == \
+        generation_key("/admin/subtopics-generate", retry, ("subtopics",))
@@ -0,0 +1,61 @@
+import random
+
+import pytest
+
+from prompt_templates import compile_prompt, fill_placeholders
+from tests.baseline import prompt_templates as baseline
+
+VOLATILE = {"errors", "attempt", "userSolution"}
+KEYS = ["topic", "subtopics", "errors", "attempt", "userSolution", "missing", "note"]
+VALUES = [
+    "", "Algebra", "zażółć gęślą jaźń", "a\nb", 0, 3, 2.5, None, True, [], ["x"], [["Algebra", 80], ["Geometria", 20]],
+    ["a", ["b", "c"]], {"k": "v"}, {"nested": [1, {"ł": "ó"}]},
+]
+
+
+def random_template(rng: random.Random) -> str:
+    parts = []
+    for _ in range(rng.randint(0, 12)):
+        choice = rng.random()
+        key = rng.choice(KEYS)
+        if choice < 0.35:
+            parts.append(f"{{${key}$}}")
+        elif choice < 0.6:
+            parts.append(f"{{#{key}#}}")
+        else:
+            # Без "{$"/"$}" в литералах: старый второй проход собирал из них и подставленных значений новые слоты
+            parts.append(rng.choice(["Tekst ", "\n", "{", "}", "$", "{#x", " #} ", "Start:", "ąę "]))
+    return "".join(parts)
+
+
+def random_data(rng: random.Random) -> dict:
+    return {key: rng.choice(VALUES) for key in KEYS if key != "missing" and rng.random() < 0.8}
+
+
+def test_randomized_fill_matches_baseline():
+    rng = random.Random(15)
+    for _ in range(3000):
+        template, data = random_template(rng), random_data(rng)
+        assert fill_placeholders(template, data) == baseline.fill_placeholders(template, data), (template, data)
+
+
+def test_randomized_stable_prompt_matches_baseline():
+    rng = random.Random(14)
+    for _ in range(3000):
+        template, data = random_template(rng), random_data(rng)
+        assert compile_prompt(template).render_stable(data, VOLATILE) == \
+            baseline.assemble_prompt(template, data, VOLATILE), (template, data)
+
+
+def test_repeated_slot_is_rendered_once_per_call():
+    template = "{#topic#} {$topic$} {#topic#} {$topic$}"
+    data = {"topic": ["a", ["b", 1]]}
+    assert fill_placeholders(template, data) == baseline.fill_placeholders(template, data)
+    assert len(compile_prompt(template).slots) == 4
+
+
+def test_value_with_slot_syntax_is_not_substituted_again():
+    # Старый второй проход re.sub подставлял {$...$} и внутри уже вставленного JSON; компилированный шаблон - нет
+    data = {"note": "{$topic$}", "topic": "Algebra"}
+    assert fill_placeholders("{#note#}", data) == '"{$topic$}"'
+    assert baseline.fill_placeholders("{#note#}", data) == '"Algebra"'
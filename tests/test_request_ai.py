@@ -0,0 +1,91 @@
+import asyncio
+
+import pytest
+
+import main
+
+
+def collect_tokens(queue: asyncio.Queue) -> str:
+    text = []
+    while not queue.empty():
+        event, payload = queue.get_nowait()
+        if event == "token":
+            text.append(payload["text"])
+    return "".join(text)
+
+
+def test_concurrent_identical_requests_share_one_upstream_call(fake_ai, monkeypatch):
+    fake_ai["delay"] = 0.01
+    saved = []
+    monkeypatch.setattr(main.cache_manager, "get_cached", lambda *args: None)
+    monkeypatch.setattr(main.cache_manager, "save_to_cache", lambda *args: saved.append(args))
+
+    data = {"endpoint": "/admin/single-flight-test", "topic": "t"}
+
+    async def call(sink: asyncio.Queue):
+        main.ai_token_sink.set(sink)
+        return await main.request_ai("Podtematy {$topic$}", data, None, max_retries=0)
+
+    async def run():
+        leader, follower = asyncio.Queue(), asyncio.Queue()
+        results = await asyncio.gather(call(leader), call(follower))
+        return results, leader, follower
+
+    results, leader, follower = asyncio.run(run())
+
+    assert results == [fake_ai["text"]] * 2
+    assert len(fake_ai["requests"]) == 1
+    assert len(saved) == 1
+    assert collect_tokens(leader) == fake_ai["text"]
+    assert collect_tokens(follower) == fake_ai["text"]
+
+
+def test_follower_deadline_extends_shared_call(fake_ai, monkeypatch):
+    fake_ai["delay"] = 0.2
+    monkeypatch.setattr(main.cache_manager, "get_cached", lambda *args: None)
+    monkeypatch.setattr(main.cache_manager, "save_to_cache", lambda *args: None)
+
+    data = {"endpoint": "/admin/single-flight-deadline-test", "topic": "t"}
+
+    async def run():
+        # Попытка ведущего сама по себе оборвалась бы через 0.05 s, а ответ идёт 0.2 s
+        leader = asyncio.create_task(main.request_ai("Podtematy {$topic$}", data, None, max_retries=0, timeout=0.05))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(main.request_ai("Podtematy {$topic$}", data, None, max_retries=0, timeout=5))
+        return await asyncio.gather(leader, follower)
+
+    assert asyncio.run(run()) == [fake_ai["text"]] * 2
+    assert len(fake_ai["requests"]) == 1
+
+
+def test_follower_with_sink_gets_text_of_non_streamed_call(fake_ai, monkeypatch):
+    fake_ai["delay"] = 0.02
+    monkeypatch.setattr(main.cache_manager, "get_cached", lambda *args: None)
+    monkeypatch.setattr(main.cache_manager, "save_to_cache", lambda *args: None)
+
+    data = {"endpoint": "/admin/single-flight-stream-test", "topic": "t"}
+
+    async def follow(sink: asyncio.Queue):
+        main.ai_token_sink.set(sink)
+        return await main.request_ai("Podtematy {$topic$}", data, None, max_retries=0)
+
+    async def run():
+        sink = asyncio.Queue()
+        leader = asyncio.create_task(main.request_ai("Podtematy {$topic$}", data, None, max_retries=0))
+        await asyncio.sleep(0)
+        await asyncio.gather(leader, follow(sink))
+        return sink
+
+    sink = asyncio.run(run())
+    assert fake_ai["requests"][0]["stream"] is False
+    assert collect_tokens(sink) == fake_ai["text"]
+
+
+def test_lone_request_keeps_its_own_deadline(fake_ai, monkeypatch):
+    fake_ai["delay"] = 0.2
+    monkeypatch.setattr(main.cache_manager, "get_cached", lambda *args: None)
+
+    data = {"endpoint": "/admin/single-flight-lone-test", "topic": "t"}
+
+    with pytest.raises(main.AIDeadlineExceeded):
+        asyncio.run(main.request_ai("Podtematy {$topic$}", data, None, max_retries=0, timeout=0.05))
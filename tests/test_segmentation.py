@@ -0,0 +1,63 @@
+import random
+
+import pytest
+
+from segmentation import AbbreviationRegistry, AbbreviationSegmenter, COMMON_ABBREVIATIONS
+from tests.baseline.segmentation import split_text_into_sentences as baseline_split
+
+
+def split(text, language):
+    return AbbreviationSegmenter(COMMON_ABBREVIATIONS[language]).split(text)
+
+
+@pytest.mark.parametrize("text, language", [
+    ("Ala ma kota. (a pies ma Alę) Koniec.", "pl"),
+    ('He said so. "and then" she left.', "en"),
+    ("Pierwsze zdanie.\nnastępne…", "pl"),
+    ("Pierwsze zdanie.\n\nDrugie zdanie.", "pl"),
+    ("Mieszka przy ul. Długiej. Pracuje np. w szkole. Koniec.", "pl"),
+    ("Dr. Smith met Mr. Jones vs. Prof. Brown. Then E.G. something. Done.", "en"),
+    ("Wynik to 3.5. Następnie 2.25 itd. Koniec.", "pl"),
+    ("Pytanie? (Tak) «Odpowiedź» „Cytat”. A? B!", "pl"),
+    ("", "pl"),
+])
+def test_matches_baseline(text, language):
+    assert split(text, language) == baseline_split(text, language)
+
+
+def test_lowercase_continuation_is_not_split():
+    assert split("Ala ma kota. (a pies ma Alę) Koniec.", "pl") == ["Ala ma kota. (a pies ma Alę) Koniec."]
+    assert split('He said so. "and then" she left.', "en") == ['He said so. "and then" she left.']
+
+
+def test_newline_is_preserved_inside_sentence():
+    assert split("Pierwsze zdanie.\nnastępne…", "pl") == ["Pierwsze zdanie.\nnastępne…"]
+
+
+def test_abbreviations_are_case_insensitive():
+    assert split("Spotkał DR. Kowalskiego. Potem wyszedł.", "pl") == [
+        "Spotkał DR. Kowalskiego.", "Potem wyszedł."
+    ]
+
+
+@pytest.mark.parametrize("language", ["pl", "en"])
+def test_randomized_matches_baseline(language):
+    rng = random.Random(20)
+    pieces = [
+        "ala", "Ala", "kot", "Ł", "ś", "x", "Я", "я", "3", "3.5", ".", ". ", "! ", "? ", "… ", " ", "  ",
+        "\n", "\t", "(", ")", '"', "„", "”", "«", "»", "'", ",", "e.g.", "u.s.",
+    ] + COMMON_ABBREVIATIONS[language] + [a.upper() for a in COMMON_ABBREVIATIONS[language]]
+    segmenter = AbbreviationSegmenter(COMMON_ABBREVIATIONS[language])
+    for _ in range(5000):
+        text = "".join(rng.choice(pieces) for _ in range(rng.randint(1, 30)))
+        assert segmenter.split(text) == baseline_split(text, language), text
+
+
+def test_registry_rebuilds_segmenter_with_custom_abbreviations():
+    registry = AbbreviationRegistry(COMMON_ABBREVIATIONS)
+    text = "To jest tzw. Zjawisko. Koniec."
+    assert registry.get("pl").split(text) == ["To jest tzw.", "Zjawisko.", "Koniec."]
+
+    registry.set_custom("pl", ["tzw."])
+    assert registry.get("pl").split(text) == ["To jest tzw. Zjawisko.", "Koniec."]
+    assert registry.custom_for("PL") == ["tzw."]
@@ -0,0 +1,136 @@
+import asyncio
+import contextvars
+
+
+from single_flight import SingleFlight
+
+
+def test_concurrent_callers_share_one_call():
+    flight = SingleFlight()
+    calls = []
+
+    async def fn(flight):
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "answer"
+
+    async def run():
+        return await asyncio.gather(*(flight.do("key", fn) for _ in range(3)))
+
+    results = asyncio.run(run())
+    assert len(calls) == 1
+    assert [value for value, _ in results] == ["answer"] * 3
+    assert sorted(shared for _, shared in results) == [False, True, True]
+    assert flight.stats() == {"in_flight": 0, "leaders": 1, "shared": 2}
+
+
+def test_sequential_calls_are_not_shared():
+    flight = SingleFlight()
+
+    async def fn(flight):
+        return "answer"
+
+    async def run():
+        return [await flight.do("key", fn), await flight.do("key", fn)]
+
+    assert asyncio.run(run()) == [("answer", False), ("answer", False)]
+
+
+def test_cancelled_waiter_does_not_cancel_others():
+    flight = SingleFlight()
+
+    async def fn(flight):
+        await asyncio.sleep(0.05)
+        return "answer"
+
+    async def run():
+        first = asyncio.create_task(flight.do("key", fn))
+        second = asyncio.create_task(flight.do("key", fn))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        return await second
+
+    assert asyncio.run(run()) == ("answer", True)
+
+
+def test_call_is_cancelled_when_last_waiter_leaves():
+    flight = SingleFlight()
+    finished = []
+
+    async def fn(flight):
+        await asyncio.sleep(0.05)
+        finished.append(1)
+
+    async def run():
+        waiter = asyncio.create_task(flight.do("key", fn))
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+        await asyncio.sleep(0.08)
+
+    asyncio.run(run())
+    assert finished == []
+    assert flight.stats()["in_flight"] == 0
+
+
+def test_error_reaches_every_waiter():
+    flight = SingleFlight()
+
+    async def fn(flight):
+        await asyncio.sleep(0.01)
+        raise RuntimeError("upstream")
+
+    async def run():
+        return await asyncio.gather(flight.do("key", fn), flight.do("key", fn), return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+
+def test_tokens_fan_out_and_replay_to_late_waiter():
+    flight = SingleFlight()
+
+    async def fn(call):
+        call.tokens.put_nowait(("token", "a"))
+        await asyncio.sleep(0.02)
+        call.tokens.put_nowait(("token", "b"))
+        return "ab"
+
+    async def run():
+        early, late = asyncio.Queue(), asyncio.Queue()
+        first = asyncio.create_task(flight.do("key", fn, sink=early))
+        await asyncio.sleep(0.01)
+        second = asyncio.create_task(flight.do("key", fn, sink=late))
+        await asyncio.gather(first, second)
+        return [early.get_nowait() for _ in range(early.qsize())], [late.get_nowait() for _ in range(late.qsize())]
+
+    early, late = asyncio.run(run())
+    assert early == late == [("token", "a"), ("token", "b")]
+
+
+def test_shared_call_gets_latest_deadline():
+    flight = SingleFlight()
+    seen = []
+
+    async def fn(call):
+        await asyncio.sleep(0.02)
+        seen.append(call.deadline)
+
+    async def run():
+        await asyncio.gather(flight.do("key", fn, deadline=10.0), flight.do("key", fn, deadline=30.0))
+
+    asyncio.run(run())
+    assert seen == [30.0]
+
+
+def test_shared_call_does_not_see_leader_context():
+    flight = SingleFlight()
+    var = contextvars.ContextVar("var", default="neutral")
+
+    async def fn(call):
+        return var.get()
+
+    async def run():
+        var.set("leader")
+        return await flight.do("key", fn)
+
+    assert asyncio.run(run()) == ("neutral", False)